@@ -0,0 +1,192 @@
+import streamlit as st
+import pandas as pd
+import db
+
+# ==================== PAGE ====================
+st.title(":red[คาบที่ปิด]")
+st.caption("คาบที่ห้ามจัดวิชา เช่น พักกลางวัน โฮมรูม (เว้นวัน = ทุกวัน, เว้นคาบ = ทั้งวัน, เว้นกลุ่มและห้อง = ทุกกลุ่มทุกห้อง)")
+st.divider()
+upload_file = st.file_uploader("อัปโหลดไฟล์ (csv / xlsx)", type=["csv", "xlsx"])
+
+# ==================== CONFIG ====================
+TABLE_NAME = "blocked_slot"
+REQUIRED_COLS = ["day", "period", "group_id", "room_id", "label"]
+KEY_COLS = ["day", "period", "group_id", "room_id"]
+
+# ==================== MASTER DATA ====================
+def get_day_options():
+    rows = db.fetch_all("SELECT DISTINCT day FROM timeslot")
+    return [r["day"] for r in rows] if rows else []
+
+def get_period_options():
+    rows = db.fetch_all("SELECT DISTINCT period FROM timeslot")
+    return sorted(r["period"] for r in rows) if rows else []
+
+def get_group_options():
+    rows = db.fetch_all("SELECT group_id FROM `student_group`")
+    return [r["group_id"] for r in rows] if rows else []
+
+def get_room_options():
+    rows = db.fetch_all("SELECT room_id FROM room")
+    return [r["room_id"] for r in rows] if rows else []
+
+DAY_OPTIONS = get_day_options()
+PERIOD_OPTIONS = get_period_options()
+GROUP_OPTIONS = get_group_options()
+ROOM_OPTIONS = get_room_options()
+
+# ==================== COLUMN CONFIG ====================
+columns_new = {
+    "day": st.column_config.SelectboxColumn("วัน (ว่าง = ทุกวัน)", options=DAY_OPTIONS),
+    "period": st.column_config.NumberColumn("คาบที่ (ว่าง = ทั้งวัน)", min_value=1, max_value=20, step=1),
+    "group_id": st.column_config.SelectboxColumn("กลุ่มเรียน (ว่าง = ทุกกลุ่ม)", options=GROUP_OPTIONS),
+    "room_id": st.column_config.SelectboxColumn("ห้อง (ว่าง = ทุกห้อง)", options=ROOM_OPTIONS),
+    "label": st.column_config.TextColumn("ชื่อที่แสดงในตาราง"),
+}
+
+columns_edit = {
+    "day": st.column_config.SelectboxColumn("วัน (ว่าง = ทุกวัน)", options=DAY_OPTIONS),
+    "period": st.column_config.NumberColumn("คาบที่ (ว่าง = ทั้งวัน)", min_value=1, max_value=20, step=1),
+    "group_id": st.column_config.SelectboxColumn("กลุ่มเรียน (ว่าง = ทุกกลุ่ม)", options=GROUP_OPTIONS),
+    "room_id": st.column_config.SelectboxColumn("ห้อง (ว่าง = ทุกห้อง)", options=ROOM_OPTIONS),
+    "label": st.column_config.TextColumn("ชื่อที่แสดงในตาราง"),
+}
+
+# ==================== DB FUNCTIONS ====================
+def fetch_blocked():
+    rows = db.fetch_all(f"SELECT day, period, group_id, room_id, label FROM {TABLE_NAME} ORDER BY day, period")
+    return pd.DataFrame(rows, columns=REQUIRED_COLS) if rows else pd.DataFrame(columns=REQUIRED_COLS)
+
+def get_existing_rows():
+    df = clean_data(fetch_blocked())
+    return set(df[KEY_COLS].itertuples(index=False, name=None))
+
+# ==================== UTIL ====================
+def clean_data(df):
+    df = df.copy()
+    # ช่องว่าง = ทุกวัน / ทั้งวัน / ทุกกลุ่ม / ทุกห้อง เก็บเป็น NULL
+    for c in ["day", "group_id", "room_id"]:
+        df[c] = df[c].astype("string").str.strip().replace({"": pd.NA, "nan": pd.NA, "None": pd.NA})
+    df["period"] = pd.to_numeric(df["period"], errors="coerce").astype("Int64")
+    df["label"] = df["label"].fillna("").astype(str).str.strip()
+    return df
+
+def value(v):
+    if pd.isna(v):
+        return None
+    return v.item() if hasattr(v, "item") else v  # numpy int -> int
+
+def to_params(df):
+    return [tuple(value(v) for v in row) for row in df[REQUIRED_COLS].itertuples(index=False, name=None)]
+
+def validate_data(df, existing_rows):
+    errors = []
+
+    # ว่างทุกช่อง = ปิดทุกคาบของทุกกลุ่ม
+    everything = df["day"].isna() & df["period"].isna() & df["group_id"].isna() & df["room_id"].isna()
+    if everything.any():
+        errors.append(f"❌ พบแถวที่ปิดทุกคาบของทุกกลุ่มทุกห้อง {everything.sum()} รายการ")
+
+    # ซ้ำในไฟล์
+    dup_file = df[df.duplicated(subset=KEY_COLS, keep=False)]
+    if not dup_file.empty:
+        errors.append(f"❌ พบข้อมูลซ้ำในไฟล์ {len(dup_file)} รายการ")
+
+    # ซ้ำในระบบ
+    if existing_rows is not None:
+        conflict = set(df[KEY_COLS].itertuples(index=False, name=None)) & existing_rows
+        if conflict:
+            errors.append(f"❌ ซ้ำกับข้อมูลในระบบ {len(conflict)} รายการ")
+
+    # วัน/คาบ/กลุ่ม/ห้อง ไม่มีในระบบ
+    for col, options, name in (("day", DAY_OPTIONS, "วัน"), ("period", PERIOD_OPTIONS, "คาบ"),
+                               ("group_id", GROUP_OPTIONS, "group_id"), ("room_id", ROOM_OPTIONS, "room_id")):
+        bad = df[col].notna() & ~df[col].isin(options)
+        if bad.any():
+            errors.append(f"❌ พบ{name}ที่ไม่มีในระบบ: {', '.join(map(str, df.loc[bad, col].unique()))}")
+
+    return errors, dup_file
+
+# ==================== IMPORT SECTION ====================
+existing_rows = get_existing_rows()
+
+if upload_file:
+    df = (
+        pd.read_csv(upload_file)
+        if upload_file.name.endswith(".csv")
+        else pd.read_excel(upload_file)
+    )
+
+    for c in REQUIRED_COLS:
+        if c not in df.columns:
+            df[c] = None
+
+    st.subheader("📋 Preview & แก้ไขข้อมูล")
+
+    edited_df = st.data_editor(
+        clean_data(df[REQUIRED_COLS]),
+        num_rows="dynamic",
+        use_container_width=True,
+        column_config=columns_new,
+        key="import_editor",
+    )
+
+    edited_df = clean_data(edited_df)
+    errors, dup_file = validate_data(edited_df, existing_rows)
+
+    st.info(f"📊 จำนวนข้อมูล: {len(edited_df)}")
+
+    for e in errors:
+        st.error(e)
+
+    if not dup_file.empty:
+        with st.expander("ดูข้อมูลที่ซ้ำในไฟล์"):
+            st.dataframe(dup_file, use_container_width=True)
+
+    can_save = len(errors) == 0 and len(edited_df) > 0
+
+    if st.button("💾 บันทึก", type="primary", disabled=not can_save, key="save_import"):
+        try:
+            sql = f"INSERT INTO {TABLE_NAME} (day, period, group_id, room_id, label) VALUES (%s, %s, %s, %s, %s)"
+            db.executemany(sql, to_params(edited_df))
+            st.success(f"✅ บันทึกสำเร็จ {len(edited_df)} รายการ")
+            st.balloons()
+            st.rerun()
+        except Exception as e:
+            st.error(f"❌ เกิดข้อผิดพลาด: {e}")
+
+# ==================== EXISTING DATA ====================
+st.divider()
+blocked_df = clean_data(fetch_blocked())
+
+st.subheader(f"📋 ข้อมูลในระบบ ({len(blocked_df)} รายการ)")
+if blocked_df.empty:
+    st.info("📭 ยังไม่มีข้อมูลในระบบ (จัดวิชาได้ทุกคาบ)")
+
+edited_existing = st.data_editor(
+    blocked_df,
+    num_rows="dynamic",
+    use_container_width=True,
+    column_config=columns_edit,
+    key="existing_editor",
+)
+
+if not edited_existing.equals(blocked_df):
+    edited_existing = clean_data(edited_existing)
+    errors, _ = validate_data(edited_existing, None)
+    for e in errors:
+        st.error(e)
+
+    if st.button("💾 บันทึกการแก้ไข", type="primary", disabled=bool(errors)):
+        try:
+            db.execute(f"DELETE FROM {TABLE_NAME}")
+            rows = to_params(edited_existing)
+            if rows:
+                db.executemany(
+                    f"INSERT INTO {TABLE_NAME} (day, period, group_id, room_id, label) VALUES (%s, %s, %s, %s, %s)",
+                    rows,
+                )
+            st.success("✅ บันทึกการแก้ไขเรียบร้อย")
+            st.rerun()
+        except Exception as e:
+            st.error(f"❌ เกิดข้อผิดพลาด: {e}")
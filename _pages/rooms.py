@@ -10,20 +10,23 @@ upload_data = st.file_uploader("อัปโหลดไฟล์", type=["csv",
 TABLE_NAME = "room"
 PRIMARY_KEY = "room_id"
 REQUIRED_COLS = ['room_id', 'room_name', 'room_type']
+OPTIONAL_COLS = ['capacity']
 ROOM_TYPE_OPTIONS = ['Theory', 'English Lab', 'Computer Lab', 'IOT Lab', 'Network Lab', 'Factory', 'AI', 'Lab']
 
 # Column config สำหรับเพิ่มใหม่ (แก้ไข room_id ได้)
 room_columns_new = {
     "room_id": st.column_config.TextColumn("รหัสห้องเรียน", required=True),
     "room_name": st.column_config.TextColumn("ชื่อห้องเรียน", required=True),
-    "room_type": st.column_config.SelectboxColumn("ประเภทห้อง", required=True, options=ROOM_TYPE_OPTIONS)
+    "room_type": st.column_config.SelectboxColumn("ประเภทห้อง", required=True, options=ROOM_TYPE_OPTIONS),
+    "capacity": st.column_config.NumberColumn("ความจุ (คน)", min_value=0, help="เว้นว่าง = ไม่จำกัด")
 }
 
 # Column config สำหรับแก้ไข (room_id disabled)
 room_columns_edit = {
     "room_id": st.column_config.TextColumn("รหัสห้องเรียน", disabled=True),
     "room_name": st.column_config.TextColumn("ชื่อห้องเรียน", required=True),
-    "room_type": st.column_config.SelectboxColumn("ประเภทห้อง", required=True, options=ROOM_TYPE_OPTIONS)
+    "room_type": st.column_config.SelectboxColumn("ประเภทห้อง", required=True, options=ROOM_TYPE_OPTIONS),
+    "capacity": st.column_config.NumberColumn("ความจุ (คน)", min_value=0, help="เว้นว่าง = ไม่จำกัด")
 }
 
 
@@ -62,6 +65,11 @@ def validate_data(df, existing_ids=None):
         bad_types = df.loc[invalid_types, 'room_type'].unique().tolist()
         errors.append(f"❌ พบ room_type ไม่ถูกต้อง: {', '.join(map(str, bad_types))}")
 
+    capacity = pd.to_numeric(df['capacity'], errors='coerce')
+    invalid_capacity = (capacity.isna() & df['capacity'].notna()) | (capacity < 0)
+    if invalid_capacity.any():
+        errors.append(f"❌ พบ capacity ไม่ถูกต้อง {invalid_capacity.sum()} รายการ")
+
     return errors, warnings, duplicates
 
 
@@ -73,6 +81,11 @@ def clean_data(df):
     return df
 
 
+def to_capacity(value):
+    """ความจุสำหรับบันทึกลงฐานข้อมูล (ว่าง = NULL)"""
+    return None if pd.isna(value) else int(value)
+
+
 # ==================== MAIN ====================
 rooms = fetch_rooms()
 existing_ids = rooms['room_id'].tolist() if not rooms.empty else []
@@ -84,6 +97,10 @@ if upload_data is not None:
     else:
         df = pd.read_excel(upload_data)
 
+    for col in OPTIONAL_COLS:
+        if col not in df.columns:
+            df[col] = None
+
     missing_cols = [col for col in REQUIRED_COLS if col not in df.columns]
     if missing_cols:
         st.error(f"❌ ไม่พบคอลัมน์: {', '.join(missing_cols)}")
@@ -91,7 +108,7 @@ if upload_data is not None:
         st.subheader("📋 Preview และแก้ไขข้อมูล")
 
         edited_df = st.data_editor(
-            df[REQUIRED_COLS],
+            df[REQUIRED_COLS + OPTIONAL_COLS],
             num_rows="dynamic",
             use_container_width=True,
             column_config=room_columns_new,
@@ -117,11 +134,11 @@ if upload_data is not None:
 
         if st.button("💾 บันทึก", type="primary", disabled=not can_save, key="save_import"):
             try:
-                sql = f"INSERT INTO {TABLE_NAME} (room_id, room_name, room_type) VALUES (?, ?, ?)"
+                sql = f"INSERT INTO {TABLE_NAME} (room_id, room_name, room_type, capacity) VALUES (%s, %s, %s, %s)"
                 count = 0
                 for _, row in edited_df.iterrows():
                     if row['room_id']:
-                        db.execute(sql, (row['room_id'], row['room_name'], row['room_type']))
+                        db.execute(sql, (row['room_id'], row['room_name'], row['room_type'], to_capacity(row['capacity'])))
                         count += 1
                 st.success(f"✅ บันทึกสำเร็จ {count} รายการ")
                 st.balloons()
@@ -148,8 +165,8 @@ else:
         if st.button("💾 บันทึกการแก้ไข", type="primary"):
             try:
                 for _, row in edited_rooms.iterrows():
-                    sql = f"UPDATE {TABLE_NAME} SET room_name=?, room_type=? WHERE room_id=?"
-                    db.execute(sql, (row['room_name'], row['room_type'], row['room_id']))
+                    sql = f"UPDATE {TABLE_NAME} SET room_name=%s, room_type=%s, capacity=%s WHERE room_id=%s"
+                    db.execute(sql, (row['room_name'], row['room_type'], to_capacity(row['capacity']), row['room_id']))
                 st.success("✅ บันทึกการแก้ไขสำเร็จ")
                 st.rerun()
             except Exception as e:
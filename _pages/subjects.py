@@ -10,6 +10,9 @@ upload_data = st.file_uploader("อัปโหลดไฟล์", type=["csv",
 TABLE_NAME = "subject"
 PRIMARY_KEY = "subject_id"
 REQUIRED_COLS = ['subject_id', 'subject_name', 'theory', 'practice', 'credit']
+OPTIONAL_COLS = ['room_type']
+ROOM_TYPE_OPTIONS = ['Theory', 'English Lab', 'Computer Lab', 'IOT Lab', 'Network Lab', 'Factory', 'AI', 'Lab']
+ROOM_TYPE_HELP = f"ประเภทห้องที่ต้องใช้ คั่นด้วย , (เว้นว่าง = ห้องใดก็ได้): {', '.join(ROOM_TYPE_OPTIONS)}"
 
 # Column config สำหรับเพิ่มใหม่ (แก้ไข subject_id ได้)
 subject_columns_new = {
@@ -17,7 +20,8 @@ subject_columns_new = {
     "subject_name": st.column_config.TextColumn("ชื่อวิชา", required=True),
     "theory": st.column_config.NumberColumn("ทฤษฎี", required=True, min_value=0),
     "practice": st.column_config.NumberColumn("ปฏิบัติ", required=True, min_value=0),
-    "credit": st.column_config.NumberColumn("หน่วยกิต", required=True, min_value=0)
+    "credit": st.column_config.NumberColumn("หน่วยกิต", required=True, min_value=0),
+    "room_type": st.column_config.TextColumn("ประเภทห้อง", help=ROOM_TYPE_HELP)
 }
 
 # Column config สำหรับแก้ไข (subject_id disabled)
@@ -26,7 +30,8 @@ subject_columns_edit = {
     "subject_name": st.column_config.TextColumn("ชื่อวิชา", required=True),
     "theory": st.column_config.NumberColumn("ทฤษฎี", required=True, min_value=0),
     "practice": st.column_config.NumberColumn("ปฏิบัติ", required=True, min_value=0),
-    "credit": st.column_config.NumberColumn("หน่วยกิต", required=True, min_value=0)
+    "credit": st.column_config.NumberColumn("หน่วยกิต", required=True, min_value=0),
+    "room_type": st.column_config.TextColumn("ประเภทห้อง", help=ROOM_TYPE_HELP)
 }
 
 # ==================== FUNCTIONS ====================
@@ -59,6 +64,10 @@ def validate_data(df, existing_ids=None):
     if empty_names.any():
         warnings.append(f"⚠️ พบ subject_name ว่างเปล่า {empty_names.sum()} รายการ")
 
+    bad_types = {t for types in df['room_type'] for t in types.split(',') if t and t not in ROOM_TYPE_OPTIONS}
+    if bad_types:
+        errors.append(f"❌ พบ room_type ไม่ถูกต้อง: {', '.join(sorted(bad_types))}")
+
     return errors, warnings, duplicates
 
 
@@ -67,6 +76,10 @@ def clean_data(df):
     df = df.copy()
     for col in ['subject_id', 'subject_name']:
         df[col] = df[col].astype(str).str.strip()
+    # room_type: ตัดช่องว่างแต่ละประเภท เก็บเป็น "A,B"
+    df['room_type'] = df['room_type'].fillna('').astype(str).apply(
+        lambda x: ','.join(t.strip() for t in x.split(',') if t.strip())
+    )
     return df
 
 
@@ -81,6 +94,10 @@ if upload_data is not None:
     else:
         df = pd.read_excel(upload_data)
 
+    for col in OPTIONAL_COLS:
+        if col not in df.columns:
+            df[col] = ''
+
     missing_cols = [col for col in REQUIRED_COLS if col not in df.columns]
     if missing_cols:
         st.error(f"❌ ไม่พบคอลัมน์: {', '.join(missing_cols)}")
@@ -88,7 +105,7 @@ if upload_data is not None:
         st.subheader("📋 Preview และแก้ไขข้อมูล")
 
         edited_df = st.data_editor(
-            df[REQUIRED_COLS],
+            df[REQUIRED_COLS + OPTIONAL_COLS],
             num_rows="dynamic",
             use_container_width=True,
             column_config=subject_columns_new,
@@ -114,11 +131,11 @@ if upload_data is not None:
 
         if st.button("💾 บันทึก", type="primary", disabled=not can_save, key="save_import"):
             try:
-                sql = f"INSERT INTO {TABLE_NAME} (subject_id, subject_name, theory, practice, credit) VALUES (?, ?, ?, ?, ?)"
+                sql = f"INSERT INTO {TABLE_NAME} (subject_id, subject_name, theory, practice, credit, room_type) VALUES (%s, %s, %s, %s, %s, %s)"
                 count = 0
                 for _, row in edited_df.iterrows():
                     if row['subject_id']:
-                        db.execute(sql, (row['subject_id'], row['subject_name'], row['theory'], row['practice'], row['credit']))
+                        db.execute(sql, (row['subject_id'], row['subject_name'], row['theory'], row['practice'], row['credit'], row['room_type']))
                         count += 1
                 st.success(f"✅ บันทึกสำเร็จ {count} รายการ")
                 st.balloons()
@@ -142,11 +159,16 @@ else:
     )
 
     if not edited_subjects.equals(subjects):
-        if st.button("💾 บันทึกการแก้ไข", type="primary"):
+        edited_subjects = clean_data(edited_subjects)
+        errors, _, _ = validate_data(edited_subjects)
+        for error in errors:
+            st.error(error)
+
+        if st.button("💾 บันทึกการแก้ไข", type="primary", disabled=len(errors) > 0):
             try:
                 for _, row in edited_subjects.iterrows():
-                    sql = f"UPDATE {TABLE_NAME} SET subject_name=?, theory=?, practice=?, credit=? WHERE subject_id=?"
-                    db.execute(sql, (row['subject_name'], row['theory'], row['practice'], row['credit'], row['subject_id']))
+                    sql = f"UPDATE {TABLE_NAME} SET subject_name=%s, theory=%s, practice=%s, credit=%s, room_type=%s WHERE subject_id=%s"
+                    db.execute(sql, (row['subject_name'], row['theory'], row['practice'], row['credit'], row['room_type'], row['subject_id']))
                 st.success("✅ บันทึกการแก้ไขสำเร็จ")
                 st.rerun()
             except Exception as e:
@@ -0,0 +1,196 @@
+import streamlit as st
+import pandas as pd
+import db
+
+# ==================== PAGE ====================
+st.title(":red[วันเวลาที่อาจารย์ไม่ว่าง]")
+st.caption("คาบที่อาจารย์สอนไม่ได้ ตัวจัดตารางจะไม่ลงวิชาของอาจารย์ในคาบนี้ (เว้นคาบว่าง = ไม่ว่างทั้งวัน)")
+st.divider()
+upload_file = st.file_uploader("อัปโหลดไฟล์ (csv / xlsx)", type=["csv", "xlsx"])
+
+# ==================== CONFIG ====================
+TABLE_NAME = "teacher_unavailable"
+REQUIRED_COLS = ["teacher_id", "day", "period"]
+
+# ==================== MASTER DATA ====================
+def get_teacher_options():
+    rows = db.fetch_all("SELECT teacher_id FROM teacher")
+    return [r["teacher_id"] for r in rows] if rows else []
+
+def get_day_options():
+    rows = db.fetch_all("SELECT DISTINCT day FROM timeslot")
+    return [r["day"] for r in rows] if rows else []
+
+def get_period_options():
+    rows = db.fetch_all("SELECT DISTINCT period FROM timeslot")
+    return sorted(r["period"] for r in rows) if rows else []
+
+TEACHER_OPTIONS = get_teacher_options()
+DAY_OPTIONS = get_day_options()
+PERIOD_OPTIONS = get_period_options()
+
+# ==================== COLUMN CONFIG ====================
+columns_new = {
+    "teacher_id": st.column_config.SelectboxColumn(
+        "รหัสอาจารย์", required=True, options=TEACHER_OPTIONS
+    ),
+    "day": st.column_config.SelectboxColumn(
+        "วัน", required=True, options=DAY_OPTIONS
+    ),
+    "period": st.column_config.NumberColumn(
+        "คาบที่ (ว่าง = ทั้งวัน)", min_value=1, max_value=20, step=1
+    ),
+}
+
+columns_edit = {
+    "teacher_id": st.column_config.SelectboxColumn(
+        "รหัสอาจารย์", required=True, options=TEACHER_OPTIONS
+    ),
+    "day": st.column_config.SelectboxColumn(
+        "วัน", required=True, options=DAY_OPTIONS
+    ),
+    "period": st.column_config.NumberColumn(
+        "คาบที่ (ว่าง = ทั้งวัน)", min_value=1, max_value=20, step=1
+    ),
+}
+
+# ==================== DB FUNCTIONS ====================
+def fetch_unavailable():
+    rows = db.fetch_all(f"SELECT teacher_id, day, period FROM {TABLE_NAME} ORDER BY teacher_id, day, period")
+    return pd.DataFrame(rows, columns=REQUIRED_COLS) if rows else pd.DataFrame(columns=REQUIRED_COLS)
+
+def get_existing_rows():
+    df = clean_data(fetch_unavailable())
+    return set(zip(df["teacher_id"], df["day"], df["period"]))
+
+# ==================== UTIL ====================
+def clean_data(df):
+    df = df.copy()
+    for c in ["teacher_id", "day"]:
+        df[c] = df[c].astype(str).str.strip()
+    # คาบว่าง = ทั้งวัน เก็บเป็น NULL
+    df["period"] = pd.to_numeric(df["period"], errors="coerce").astype("Int64")
+    return df
+
+def period_value(period):
+    return None if pd.isna(period) else int(period)
+
+def validate_data(df, existing_rows):
+    errors = []
+
+    # ว่าง
+    empty = df["teacher_id"].isin(["", "nan", "None"]) | df["day"].isin(["", "nan", "None"])
+    if empty.any():
+        errors.append(f"❌ พบข้อมูลว่าง {empty.sum()} รายการ")
+
+    # ซ้ำในไฟล์
+    dup_file = df[df.duplicated(subset=REQUIRED_COLS, keep=False)]
+    if not dup_file.empty:
+        errors.append(f"❌ พบข้อมูลซ้ำในไฟล์ {len(dup_file)} รายการ")
+
+    # ซ้ำในระบบ
+    if existing_rows is not None:
+        conflict = set(zip(df["teacher_id"], df["day"], df["period"])) & existing_rows
+        if conflict:
+            text = ", ".join(f"({t}, {d}, {'ทั้งวัน' if pd.isna(p) else p})" for t, d, p in conflict)
+            errors.append(f"❌ ซ้ำกับข้อมูลในระบบ: {text}")
+
+    # teacher ไม่ถูกต้อง
+    bad_teacher = ~df["teacher_id"].isin([str(t) for t in TEACHER_OPTIONS])
+    if bad_teacher.any():
+        errors.append(f"❌ พบ teacher_id ไม่มีในระบบ: {', '.join(df.loc[bad_teacher, 'teacher_id'].unique())}")
+
+    # วัน/คาบ ไม่มีในตารางคาบ
+    bad_day = ~df["day"].isin(DAY_OPTIONS)
+    if bad_day.any():
+        errors.append(f"❌ พบวันที่ไม่มีในตารางคาบ: {', '.join(df.loc[bad_day, 'day'].unique())}")
+
+    bad_period = df["period"].notna() & ~df["period"].isin(PERIOD_OPTIONS)
+    if bad_period.any():
+        errors.append(f"❌ พบคาบที่ไม่มีในตารางคาบ: {', '.join(map(str, df.loc[bad_period, 'period'].unique()))}")
+
+    return errors, dup_file
+
+# ==================== IMPORT SECTION ====================
+existing_rows = get_existing_rows()
+
+if upload_file:
+    df = (
+        pd.read_csv(upload_file)
+        if upload_file.name.endswith(".csv")
+        else pd.read_excel(upload_file)
+    )
+
+    if "period" not in df.columns:
+        df["period"] = None
+    missing = [c for c in REQUIRED_COLS if c not in df.columns]
+    if missing:
+        st.error(f"❌ ไม่พบคอลัมน์: {', '.join(missing)}")
+    else:
+        st.subheader("📋 Preview & แก้ไขข้อมูล")
+
+        edited_df = st.data_editor(
+            clean_data(df[REQUIRED_COLS]),
+            num_rows="dynamic",
+            use_container_width=True,
+            column_config=columns_new,
+            key="import_editor",
+        )
+
+        edited_df = clean_data(edited_df)
+        errors, dup_file = validate_data(edited_df, existing_rows)
+
+        st.info(f"📊 จำนวนข้อมูล: {len(edited_df)}")
+
+        for e in errors:
+            st.error(e)
+
+        if not dup_file.empty:
+            with st.expander("ดูข้อมูลที่ซ้ำในไฟล์"):
+                st.dataframe(dup_file, use_container_width=True)
+
+        can_save = len(errors) == 0 and len(edited_df) > 0
+
+        if st.button("💾 บันทึก", type="primary", disabled=not can_save, key="save_import"):
+            try:
+                sql = f"INSERT INTO {TABLE_NAME} (teacher_id, day, period) VALUES (%s, %s, %s)"
+                db.executemany(sql, [(r.teacher_id, r.day, period_value(r.period)) for r in edited_df.itertuples()])
+                st.success(f"✅ บันทึกสำเร็จ {len(edited_df)} รายการ")
+                st.balloons()
+                st.rerun()
+            except Exception as e:
+                st.error(f"❌ เกิดข้อผิดพลาด: {e}")
+
+# ==================== EXISTING DATA ====================
+st.divider()
+unavailable_df = clean_data(fetch_unavailable())
+
+st.subheader(f"📋 ข้อมูลในระบบ ({len(unavailable_df)} รายการ)")
+if unavailable_df.empty:
+    st.info("📭 ยังไม่มีข้อมูลในระบบ (อาจารย์ทุกคนว่างทุกคาบ)")
+
+edited_existing = st.data_editor(
+    unavailable_df,
+    num_rows="dynamic",
+    use_container_width=True,
+    column_config=columns_edit,
+    key="existing_editor",
+)
+
+if not edited_existing.equals(unavailable_df):
+    edited_existing = clean_data(edited_existing)
+    errors, _ = validate_data(edited_existing, None)
+    for e in errors:
+        st.error(e)
+
+    if st.button("💾 บันทึกการแก้ไข", type="primary", disabled=bool(errors)):
+        try:
+            db.execute(f"DELETE FROM {TABLE_NAME}")
+            sql = f"INSERT INTO {TABLE_NAME} (teacher_id, day, period) VALUES (%s, %s, %s)"
+            rows = [(r.teacher_id, r.day, period_value(r.period)) for r in edited_existing.itertuples()]
+            if rows:
+                db.executemany(sql, rows)
+            st.success("✅ บันทึกการแก้ไขเรียบร้อย")
+            st.rerun()
+        except Exception as e:
+            st.error(f"❌ เกิดข้อผิดพลาด: {e}")
@@ -1,8 +1,8 @@
 import streamlit as st
-from ortools.sat.python import cp_model
-from collections import defaultdict
 import db
-import time
+import jobs
+import os
+import scheduler
 from string import Template
 import pandas as pd
 from streamlit_cookies_controller import CookieController
@@ -24,6 +24,60 @@ st.divider()
 GROUPS = [g["group_id"] for g in db.fetch_all("SELECT group_id FROM student_group")]
 
 
+# ======================
+# BLOCKED SLOTS
+# ======================
+DAYS = [("Mon", "จันทร์"), ("Tue", "อังคาร"), ("Wed", "พุธ"), ("Thu", "พฤหัสบดี"), ("Fri", "ศุกร์")]
+PERIODS = range(1, 13)
+BLOCKED_SLOTS = db.fetch_all("SELECT day, period, group_id, room_id, label FROM blocked_slot")
+EMPTY_CELL = "<p style='visibility:hidden;'>-</p>"
+HOMEROOM_LABEL = "โฮมรูม"  # คาบที่ชื่อนี้แสดงครูที่ปรึกษาของกลุ่มใต้ชื่อคาบ
+
+
+def blocked_labels(group_id=None):
+    """{(day, period): label} ของคาบที่ปิดทุกกลุ่ม (รวมคาบที่ปิดเฉพาะ group_id ถ้าระบุ) ใช้ข้อมูลชุดเดียวกับตัวจัดตาราง"""
+    labels = {}
+    # ใส่คาบที่ปิดเฉพาะกลุ่มก่อน คาบที่ปิดทุกกลุ่ม (เช่น พักกลางวัน) ทับทีหลังเพื่อให้ยังรวมเป็นคอลัมน์เดียวได้
+    for b in sorted(BLOCKED_SLOTS, key=lambda b: not b["group_id"]):
+        if b["room_id"] or (b["group_id"] and b["group_id"] != group_id):
+            continue
+        for day, _ in DAYS:
+            for p in PERIODS:
+                if scheduler.slot_matches(b["day"], b["period"], {"day": day, "period": p}):
+                    labels[day, p] = b["label"]
+    return labels
+
+
+def day_rows(cells, labels, notes=None):
+    """HTML แถวละวัน คาบที่ปิดแสดงชื่อ ถ้าปิดทุกวันด้วยชื่อเดียวกันและไม่มีวิชาลง รวมเป็นช่องเดียวทั้งคอลัมน์
+
+    notes = {label: ข้อความ} แสดงในวงเล็บใต้ชื่อคาบ เช่น ครูที่ปรึกษาในคาบโฮมรูม
+    """
+    notes = notes or {}
+
+    def note(label):
+        return f"<br>({notes[label]})" if notes.get(label) else ""
+
+    merged = {p for p in PERIODS
+              if labels.get((DAYS[0][0], p)) is not None
+              and all(labels.get((day, p)) == labels[DAYS[0][0], p] and not cells.get(f"{day.upper()}_{p}")
+                      for day, _ in DAYS)}
+    rows = []
+    for k, (day, name) in enumerate(DAYS):
+        tds = [f"<td>{name}</td>"]
+        for p in PERIODS:
+            if p in merged:
+                if k == 0:
+                    tds.append(f'<td rowspan="{len(DAYS)}">{labels[day, p]}{note(labels[day, p])}</td>')
+                continue
+            content = "<br>".join(cells.get(f"{day.upper()}_{p}", []))
+            if (day, p) in labels:
+                content = f"<b>{labels[day, p]}</b>{note(labels[day, p])}" + (f"<br>{content}" if content else "")
+            tds.append(f"<td>{content or EMPTY_CELL}</td>")
+        rows.append("<tr>" + "".join(tds) + "</tr>")
+    return "\n".join(rows)
+
+
 if role == 'admin':
 
     cols = st.columns(5)
@@ -41,161 +95,116 @@ if role == 'admin':
             file_name='output.csv',
             mime='text/csv')
 
-    # Progress bar & status text
-    progress_bar = st.progress(0)
-    status_text = st.empty()
+    with cols[2]:
+        engine = st.selectbox("รูปแบบโมเดล", options=list(scheduler.ENGINES), label_visibility="collapsed")
+
+    with cols[3]:
+        draft_button = st.button(label="ร่างตารางด่วน (ไม่ใช้ solver)")
+
+    with st.expander("ตั้งค่า solver"):
+        setting_cols = st.columns(4)
+        with setting_cols[0]:
+            num_workers = st.number_input("จำนวน worker", min_value=1, value=os.cpu_count() or 1)
+        with setting_cols[1]:
+            time_limit = st.number_input("เวลาสูงสุด (วินาที)", min_value=1, value=300)
+        with setting_cols[2]:
+            random_seed = st.number_input("random seed", min_value=0, value=0)
+        with setting_cols[3]:
+            stop_at_first = st.checkbox("หยุดเมื่อพบตารางแรก")
+            warm_start = st.checkbox("เริ่มจากตารางเดิม", value=True)
+            use_cache = st.checkbox("ใช้ผลเดิมถ้าข้อมูลไม่เปลี่ยน (cache)", value=True)
+
+        delta_cols = st.columns(4)
+        with delta_cols[0]:
+            delta = st.checkbox("แก้เฉพาะกลุ่มที่ข้อมูลเปลี่ยน (delta)")
+        with delta_cols[1]:
+            delta_depth = st.number_input("ระยะวิชาที่ใช้ครู/ห้องร่วมกัน", min_value=0, value=1, disabled=not delta)
+        with delta_cols[2]:
+            diagnose = st.checkbox("วิเคราะห์สาเหตุเมื่อไม่มีคำตอบ")
+        with delta_cols[3]:
+            split = st.checkbox("แก้ส่วนที่ไม่ใช้ครู/ห้องร่วมกันแยก process")
+
+        quality_cols = st.columns(4)
+        with quality_cols[0]:
+            quality = st.checkbox("ลดคาบว่างและการย้ายห้อง (objective)")
+        with quality_cols[1]:
+            relative_gap = st.number_input("หยุดเมื่อห่างจาก bound ไม่เกิน (%)", min_value=0.0, max_value=100.0,
+                                           value=0.0, disabled=not quality) / 100
+        with quality_cols[2]:
+            race = st.checkbox("แข่งหลายโมเดล/seed พร้อมกัน (race)")
 
     # ======================
-    # FUNCTION TO GENERATE TIMETABLE
+    # SUBMIT JOB
     # ======================
-    def generate_timetable():
-        status_text.text("🔹 Loading subjects...")
-        SUBJECTS = db.fetch_all("SELECT subject_id, theory, practice FROM subject")
-        SUBJECT_DICT = {s["subject_id"]: s for s in SUBJECTS}
-        time.sleep(0.2)
-
-        status_text.text("🔹 Loading timeslots...")
-        TIMESLOTS = db.fetch_all("""
-            SELECT timeslot_id, day, period
-            FROM timeslot
-            WHERE period != 5
-            ORDER BY day, period
-        """)
-        TS_INDEX = {t["timeslot_id"]: i for i, t in enumerate(TIMESLOTS)}
-        DAY_TIMESLOTS = defaultdict(list)
-        for i, t in enumerate(TIMESLOTS):
-            DAY_TIMESLOTS[t["day"]].append(i)
-        PERIODS_PER_DAY = max(len(slots) for slots in DAY_TIMESLOTS.values())
-        time.sleep(0.2)
-
-        status_text.text("🔹 กำลังโหลดการลงทะเบียน...")
-        REG = db.fetch_all("SELECT group_id, subject_id FROM register")
-        GROUP_SUBJECTS = defaultdict(list)
-        for r in REG:
-            GROUP_SUBJECTS[r["group_id"]].append(r["subject_id"])
-        time.sleep(0.2)
-
-        status_text.text("🔹 กำลังโหลดงานครู...")
-        TEACH = db.fetch_all("SELECT subject_id, teacher_id FROM teach")
-        SUBJECT_TEACHERS = defaultdict(list)
-        for r in TEACH:
-            SUBJECT_TEACHERS[r["subject_id"]].append(r["teacher_id"])
-        time.sleep(0.2)
-
-        status_text.text("🔹 กำลังโหลดห้อง...")
-        ROOMS = [r["room_id"] for r in db.fetch_all("SELECT room_id FROM room")]
-        time.sleep(0.2)
-
-        # ======================
-        # CREATE VARIABLES
-        # ======================
-        status_text.text("🔹 การสร้างตัวแปร...")
-        model = cp_model.CpModel()
-        x = {}
-        skipped_subjects = []
-
-        total_subjects = sum(len(GROUP_SUBJECTS.get(g, [])) for g in GROUPS)
-        counter = 0
-
-        for g in GROUPS:
-            for sid in GROUP_SUBJECTS.get(g, []):
-                counter += 1
-                progress_bar.progress(int(counter / total_subjects * 10))  # 10% for variable creation
-                s = SUBJECT_DICT[sid]
-                hours = (s["theory"] or 0) + (s["practice"] or 0)
-
-                if hours > PERIODS_PER_DAY:
-                    skipped_subjects.append((g, sid, hours))
-                    continue
-
-                teachers = SUBJECT_TEACHERS.get(sid, []) or ["T00"]
-                for i in range(len(TIMESLOTS)):
-                    day = TIMESLOTS[i]["day"]
-                    day_slots = DAY_TIMESLOTS[day]
-                    if i in day_slots:
-                        pos_in_day = day_slots.index(i)
-                        if pos_in_day + hours <= len(day_slots):
-                            block_indices = [i + k for k in range(hours)]
-                            expected_indices = day_slots[pos_in_day:pos_in_day + hours]
-                            if block_indices == expected_indices:
-                                for tid in teachers:
-                                    for rid in ROOMS:
-                                        x[g, sid, tid, rid, i] = model.NewBoolVar(f"x_{g}_{sid}_{tid}_{rid}_{i}")
-
-        # ======================
-        # ADD CONSTRAINTS
-        # ======================
-        status_text.text("🔹 การเพิ่มข้อจำกัด...")
-        time.sleep(0.2)
-
-        # 1. Each subject exactly once
-        for g in GROUPS:
-            for sid in GROUP_SUBJECTS.get(g, []):
-                vars_ = [x[g, sid, tid, rid, i] for (gg, ss, tid, rid, i) in x if gg == g and ss == sid]
-                if vars_:
-                    model.Add(sum(vars_) == 1)
-
-        # 2. No overlap: GROUP
-        for g in GROUPS:
-            for t in range(len(TIMESLOTS)):
-                overlaps = [var for (gg, sid, tid, rid, i), var in x.items()
-                            if gg == g and i <= t < i + ((SUBJECT_DICT[sid]["theory"] or 0) + (SUBJECT_DICT[sid]["practice"] or 0))]
-                if overlaps:
-                    model.Add(sum(overlaps) <= 1)
-
-        # 3. No overlap: TEACHER
-        all_teachers = set(tid for tids in SUBJECT_TEACHERS.values() for tid in tids)
-        all_teachers.add("T00")
-        for tid in all_teachers:
-            for t in range(len(TIMESLOTS)):
-                overlaps = [var for (g, sid, tt, rid, i), var in x.items()
-                            if tt == tid and i <= t < i + ((SUBJECT_DICT[sid]["theory"] or 0) + (SUBJECT_DICT[sid]["practice"] or 0))]
-                if overlaps:
-                    model.Add(sum(overlaps) <= 1)
-
-        # 4. No overlap: ROOM
-        for rid in ROOMS:
-            for t in range(len(TIMESLOTS)):
-                overlaps = [var for (g, sid, tid, rr, i), var in x.items()
-                            if rr == rid and i <= t < i + ((SUBJECT_DICT[sid]["theory"] or 0) + (SUBJECT_DICT[sid]["practice"] or 0))]
-                if overlaps:
-                    model.Add(sum(overlaps) <= 1)
-
-        # ======================
-        # SOLVE
-        # ======================
-        status_text.text("🔹 ตารางเวลาการแก้ปัญหา...")
-        solver = cp_model.CpSolver()
-        solver.parameters.max_time_in_seconds = 300
-        status = solver.Solve(model)
-        progress_bar.progress(90)
-
-        # ======================
-        # INSERT OUTPUT
-        # ======================
-        status_text.text("🔹 บันทึกผลลัพธ์ลงฐานข้อมูล...")
-        db.execute("DELETE FROM output")
-        if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
-            for (g, sid, tid, rid, i), var in x.items():
-                if solver.Value(var) == 1:
-                    hours = (SUBJECT_DICT[sid]["theory"] or 0) + (SUBJECT_DICT[sid]["practice"] or 0)
-                    for k in range(hours):
-                        idx = i + k
-                        if idx < len(TIMESLOTS):
-                            ts_id = TIMESLOTS[idx]["timeslot_id"]
-                            db.execute(
-                                "INSERT INTO output (group_id, timeslot_id, subject_id, teacher_id, room_id) VALUES (%s,%s,%s,%s,%s)",
-                                (g, ts_id, sid, tid, rid)
-                            )
-        progress_bar.progress(100)
-        status_text.text("✅ Completed! ตารางเรียนถูกสร้างแล้ว")
-        st.rerun()
+    # solver ทำงานใน worker.py (คนละ process กับเว็บ) หน้านี้แค่ส่งงานเข้าคิว solve_job แล้วอ่านความคืบหน้า
+    if generate_button or draft_button:
+        job_id, created = jobs.submit_job({
+            "engine": engine, "time_limit": time_limit, "num_workers": num_workers, "random_seed": random_seed,
+            "stop_at_first": stop_at_first, "warm_start": warm_start, "cache": use_cache,
+            "delta": delta, "delta_depth": delta_depth, "diagnose": diagnose, "split": split,
+            "quality": quality, "relative_gap": relative_gap, "race": race, "draft_only": bool(draft_button),
+        })
+        if created:
+            st.toast(f"ส่งงาน #{job_id} เข้าคิวแล้ว")
+        else:
+            st.toast(f"งาน #{job_id} ที่ข้อมูลและการตั้งค่าเดียวกันอยู่ในคิวแล้ว ไม่สร้างงานซ้ำ")
 
     # ======================
-    # BUTTON ACTION
+    # JOB STATUS
     # ======================
-    if generate_button:
-        generate_timetable()
+    JOB_STATUS = {"queued": "รอคิว", "running": "กำลังทำ", "done": "เสร็จ", "failed": "ไม่สำเร็จ"}
+    jobs.expire_jobs()
+    active = jobs.active_jobs()
+    active_ids = {j["job_id"] for j in active}
+
+    def show_result(result):
+        if result.get("cached"):
+            st.caption("🔸 ใช้ตารางจาก cache (ข้อมูลและการตั้งค่าเหมือนรอบก่อน)")
+        elif result.get("winner"):
+            st.caption(f"🔸 ชุดที่ชนะ: {result['winner']}")
+        elif "objective" in result:
+            st.caption(f"🔸 objective {result['objective']:g} | bound {result['bound']:g} | gap {result['gap']:.1%}")
+        if result.get("problems"):
+            st.error("\n".join(f"- **[{kind}] {name}**: {message}" for kind, name, message in result["problems"]))
+        if "core" in result:
+            if result["core"]:
+                st.error("ข้อจำกัดชุดนี้ขัดแย้งกันเอง:\n"
+                         + "\n".join(f"- **[{kind}] {name}**" for kind, name in result["core"]))
+            else:
+                st.warning("ไม่พบชุดข้อจำกัดที่ขัดแย้งภายในเวลาที่กำหนด")
+        if result.get("unplaced"):
+            st.warning(f"ลงไม่ได้ {len(result['unplaced'])} วิชา:\n"
+                       + "\n".join(f"- {g} {sid}" for g, sid in result["unplaced"]))
+
+    # อ่านสถานะใหม่ทุก 2 วินาทีเฉพาะตอนมีงานค้าง (rerun เฉพาะส่วนนี้ ไม่บล็อกหน้า)
+    @st.fragment(run_every=2 if active else None)
+    def job_status():
+        jobs.expire_jobs()
+        current = jobs.active_jobs()
+        if active_ids - {j["job_id"] for j in current}:
+            st.rerun()  # งานที่ค้างตอนโหลดหน้าจบแล้ว โหลดทั้งหน้าใหม่ให้ตารางด้านล่างอ่าน output ล่าสุด
+        job = jobs.latest_job()
+        if job is None:
+            return
+        bar, stop = st.columns([6, 1])
+        bar.progress(job["progress"])
+        if job["status"] in jobs.ACTIVE and stop.button(
+                "⏹ หยุด", key=f"stop_job_{job['job_id']}", disabled=bool(job["stop_requested"]),
+                help="หยุดค้นหาแล้วบันทึกตารางที่ดีที่สุดที่หาได้ (งานที่ยังรอคิวจะถูกยกเลิก)"):
+            jobs.stop_job(job["job_id"])
+            job = jobs.get_job(job["job_id"])
+        st.text(f"งาน #{job['job_id']} ({JOB_STATUS.get(job['status'], job['status'])}) {job['message']}")
+        if job["status"] == "running" and job["stop_requested"]:
+            st.caption("ขอหยุดแล้ว งานจะหยุดเมื่อ solver เจอคำตอบถัดไป")
+        waiting = [j for j in current if j["job_id"] != job["job_id"]]
+        if waiting:
+            st.caption(f"มีงานอื่นค้างในคิวอีก {len(waiting)} งาน")
+        if job["status"] == "queued":
+            st.caption("งานจะเริ่มเมื่อ worker ว่าง (ต้องเปิด python worker.py ไว้)")
+        if job["result"]:
+            show_result(job["result"])
+
+    job_status()
 
 
 tabs = st.tabs(['ตารางเรียน', 'ตารางสอน'])
@@ -236,13 +245,10 @@ with tabs[0]:
         text = f"<b>{r['subject_id']}</b><br><span style='font-size:10px'>({r['teacher_name']} - ห้อง {r['room_name']})</span>"
         data[key].append(text)
 
-    # Fill empty cells
-    for d in ["MON","TUE","WED","THU","FRI"]:
-        for p in range(1,13):
-            data.setdefault(f"{d}_{p}", [])
+    group_data = db.fetch_one("SELECT * FROM student_group WHERE group_id = %s", (selected_group))
 
-    # HTML string
-    html_data = {k: "<br>".join(v) if v else "<p style='visibility:hidden;'>-</p>" for k,v in data.items()}
+    # HTML string (คาบที่ปิดมาจากตาราง blocked_slot)
+    html_data = {"DAY_ROWS": day_rows(data, blocked_labels(selected_group), {HOMEROOM_LABEL: group_data["advisor"]})}
 
     # Subject list
     SUBJECTS = db.fetch_all("""
@@ -253,15 +259,13 @@ with tabs[0]:
     ORDER BY s.subject_id
     """,(selected_group,))
 
-    group_data = db.fetch_one("SELECT * FROM student_group WHERE group_id = %s", (selected_group))
-
     for i in range(1, 15):
         key = f"SUBJ_{i}"
         if i-1 < len(SUBJECTS):
             s = SUBJECTS[i-1]
             html_data[key] = f"[{s['subject_id']}] [{s['theory']}-{s['practice']}-{s['credit']}] {s['subject_name']}"
         else:
-            html_data[key] = "<p style='visibility:hidden;'>-</p>"
+            html_data[key] = EMPTY_CELL
 
     html_data['GROUP_ID'] = selected_group
     html_data['ADVISOR'] = group_data['advisor']
@@ -315,11 +319,6 @@ with tabs[1]:
         text = f"<b>{r['subject_id']}</b><br><span style='font-size:10px'>({r['group_id']} - ห้อง {r['room_name']})</span>"
         data[key].append(text)
 
-    # Fill empty cells
-    for d in ["MON","TUE","WED","THU","FRI"]:
-        for p in range(1,13):
-            data.setdefault(f"{d}_{p}", [])
-
     SUBJECTS = db.fetch_all("""
     SELECT DISTINCT s.subject_name, s.subject_id, s.theory, s.practice, s.credit
     FROM teach t
@@ -328,7 +327,7 @@ with tabs[1]:
     ORDER BY s.subject_id
     """,(selected_teacher_id,))
 
-    html_data = {k: "<br>".join(v) if v else "<p style='visibility:hidden;'>-</p>" for k,v in data.items()}
+    html_data = {"DAY_ROWS": day_rows(data, blocked_labels())}
 
     # เพิ่มรายชื่อวิชาที่ครูสอน
     for i in range(1, 15):
@@ -337,7 +336,7 @@ with tabs[1]:
             s = SUBJECTS[i-1]
             html_data[key] = f"[{s['subject_id']}] [{s['theory']}-{s['practice']}-{s['credit']}] {s['subject_name']}"
         else:
-            html_data[key] = "<p style='visibility:hidden;'>-</p>"
+            html_data[key] = EMPTY_CELL
 
     # เพิ่มชื่อครู
     html_data['TEACHER_NAME'] = selected_teacher_name
@@ -37,6 +37,7 @@ def execute(sql, params=None):
         with conn.cursor() as cursor:
             cursor.execute(sql, params or ())
             conn.commit()
+            return cursor.lastrowid
     finally:
         conn.close()
 
@@ -0,0 +1,144 @@
+from datetime import datetime, timedelta
+import hashlib
+import json
+import os
+import pymysql
+import db
+import scheduler
+
+ACTIVE = ("queued", "running")
+HEARTBEAT = 30  # วินาทีระหว่าง heartbeat ของ worker
+STALE_AFTER = 180  # งาน running ที่ไม่มี heartbeat นานกว่านี้ถือว่า worker ตายแล้ว
+
+
+# ======================
+# SUBMIT (หน้าเว็บ)
+# ======================
+def job_key(options):
+    """hash ของข้อมูลนำเข้า + output ปัจจุบัน (ถ้าเริ่มจากตารางเดิม) + การตั้งค่า งานที่ key เหมือนกันได้ผลเหมือนกัน"""
+    data = scheduler.load_data()
+    parts = [scheduler.fingerprint(data, options["engine"], options["quality"]), options]
+    if options["warm_start"] or options["delta"]:
+        parts.append(sorted(scheduler.load_output_assignments(data)))
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def submit_job(options):
+    """เพิ่มงานเข้าคิว คืน (job_id, created)
+
+    ถ้ามีงานที่ข้อมูลและการตั้งค่าเหมือนกันรออยู่หรือกำลังทำ คืนงานนั้นแทน (created=False)
+    active_key เป็น UNIQUE และถูกล้างเมื่องานจบ จึงกันงานซ้ำได้แม้กดพร้อมกันหลายคน
+    """
+    options = dict(scheduler.GENERATE_OPTIONS, **options)
+    key = job_key(options)
+    try:
+        job_id = db.execute("INSERT INTO solve_job (job_key, active_key, options) VALUES (%s, %s, %s)",
+                            (key, key, json.dumps(options)))
+        return job_id, True
+    except pymysql.err.IntegrityError:
+        pass  # งานเดียวกันอยู่ในคิวแล้ว
+    # งานล่าสุดของ key นี้: งานที่ยังค้างอยู่ หรืองานที่เพิ่งจบหลัง INSERT ข้างบน (ผลเหมือนกัน ไม่ต้องทำซ้ำ)
+    row = db.fetch_one("SELECT job_id FROM solve_job WHERE job_key = %s ORDER BY job_id DESC LIMIT 1", (key,))
+    return row["job_id"], False
+
+
+def get_job(job_id):
+    """แถวของงาน (options/result แปลงจาก JSON แล้ว) หรือ None"""
+    return decode_job(db.fetch_one("SELECT * FROM solve_job WHERE job_id = %s", (job_id,)))
+
+
+def latest_job():
+    """งานล่าสุด (รวมงานที่จบแล้ว) หรือ None"""
+    return decode_job(db.fetch_one("SELECT * FROM solve_job ORDER BY job_id DESC LIMIT 1"))
+
+
+def active_jobs():
+    """งานที่รออยู่หรือกำลังทำ เรียงตามลำดับคิว"""
+    rows = db.fetch_all("SELECT * FROM solve_job WHERE status IN (%s, %s) ORDER BY job_id", ACTIVE)
+    return [decode_job(r) for r in rows or []]
+
+
+def stop_job(job_id):
+    """ปุ่มหยุดงาน: งานที่ยังรอคิวถูกยกเลิกทันที งานที่กำลังทำจะหยุดค้นหาเมื่อ worker เห็น stop_requested
+    (เก็บตารางที่ดีที่สุดที่หาได้แล้ว)
+    """
+    db.execute("""
+        UPDATE solve_job
+        SET status = 'failed', progress = 100, message = %s, finished_at = %s, active_key = NULL
+        WHERE job_id = %s AND status = 'queued'
+    """, ("ยกเลิกก่อนเริ่มทำ", datetime.now(), job_id))
+    db.execute("UPDATE solve_job SET stop_requested = TRUE WHERE job_id = %s AND status = 'running'", (job_id,))
+
+
+def decode_job(row):
+    if row:
+        row["options"] = json.loads(row["options"])
+        row["result"] = json.loads(row["result"]) if row["result"] else None
+    return row
+
+
+# ======================
+# WORKER
+# ======================
+def claim_job(worker):
+    """รับงานที่รอนานที่สุดมาทำ (UPDATE ... LIMIT 1 จึงไม่มี worker สองตัวได้งานเดียวกัน) คืน None ถ้าไม่มีงาน"""
+    db.execute("""
+        UPDATE solve_job SET status = 'running', worker = %s, started_at = %s, heartbeat_at = %s
+        WHERE status = 'queued'
+        ORDER BY job_id
+        LIMIT 1
+    """, (worker, datetime.now(), datetime.now()))
+    return decode_job(db.fetch_one("SELECT * FROM solve_job WHERE worker = %s AND status = 'running'", (worker,)))
+
+
+def update_job(job_id, progress, message):
+    """บันทึกความคืบหน้า (0-100) และข้อความล่าสุดให้หน้าเว็บอ่าน"""
+    db.execute("UPDATE solve_job SET progress = %s, message = %s WHERE job_id = %s",
+               (int(progress), message[:1000], job_id))
+
+
+def heartbeat(job_id):
+    """บอกว่า worker ยังทำงานนี้อยู่ (solver อาจไม่เรียก callback นานจึงส่งแยกจาก update_job)"""
+    db.execute("UPDATE solve_job SET heartbeat_at = %s WHERE job_id = %s", (datetime.now(), job_id))
+
+
+def stop_requested(job_id):
+    """มีคนกดหยุดงานนี้หรือยัง"""
+    row = db.fetch_one("SELECT stop_requested FROM solve_job WHERE job_id = %s", (job_id,))
+    return bool(row and row["stop_requested"])
+
+
+def finish_job(job_id, status, message, result=None):
+    """ปิดงาน (done / failed) พร้อมผลสรุป และปล่อย active_key ให้ส่งงานเดียวกันได้อีก"""
+    db.execute("""
+        UPDATE solve_job
+        SET status = %s, progress = 100, message = %s, result = %s, finished_at = %s, active_key = NULL
+        WHERE job_id = %s
+    """, (status, message[:1000], json.dumps(result, default=str) if result is not None else None,
+          datetime.now(), job_id))
+
+
+def recover_jobs(host):
+    """งาน running ของ worker บนเครื่องนี้ที่ process ไม่อยู่แล้ว (ถูก kill / เครื่องรีสตาร์ท) ถือว่าล้มเหลว"""
+    for job in db.fetch_all("SELECT job_id, worker FROM solve_job WHERE status = 'running' AND worker LIKE %s",
+                            (f"{host}:%",)) or []:
+        pid = int(job["worker"].rsplit(":", 1)[1])
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            finish_job(job["job_id"], "failed", "worker หยุดทำงานระหว่างแก้ตาราง")
+        except PermissionError:
+            pass  # process ยังอยู่ (เป็นของ user อื่น)
+
+
+def expire_jobs():
+    """งาน running ที่ไม่มี heartbeat เกิน STALE_AFTER วินาที (worker ตายบนเครื่องไหนก็ได้) ถือว่าล้มเหลว
+
+    ปล่อย active_key ด้วย ไม่อย่างนั้นงานที่ส่งซ้ำจะไปรอผลจากงานที่ไม่มีวันจบ
+    """
+    now = datetime.now()
+    db.execute("""
+        UPDATE solve_job
+        SET status = 'failed', progress = 100, message = %s, finished_at = %s, active_key = NULL
+        WHERE status = 'running' AND COALESCE(heartbeat_at, started_at) < %s
+    """, ("worker หยุดตอบสนองระหว่างแก้ตาราง", now, now - timedelta(seconds=STALE_AFTER)))
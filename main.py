@@ -56,6 +56,8 @@ else:
         st.Page('_pages/register.py'),
         st.Page('_pages/teach.py'),
         st.Page('_pages/timeslot.py'),
+        st.Page('_pages/teacher_unavailable.py'),
+        st.Page('_pages/blocked_slot.py'),
     ]
 
     pg = st.navigation(pages, position='hidden')
@@ -74,7 +76,9 @@ else:
             st.page_link(st.Page('_pages/rooms.py'), label='ห้องเรียน', icon=':material/meeting_room:')
             st.page_link(st.Page('_pages/groups.py'), label='กลุ่มการเรียน', icon=':material/table_view:')
             st.page_link(st.Page('_pages/timeslot.py'), label='คาบ', icon=':material/add_row_above:')
+            st.page_link(st.Page('_pages/blocked_slot.py'), label='คาบที่ปิด', icon=':material/block:')
             st.page_link(st.Page('_pages/teach.py'), label='แผนการสอน', icon=':material/dictionary:')
+            st.page_link(st.Page('_pages/teacher_unavailable.py'), label='วันที่อาจารย์ไม่ว่าง', icon=':material/event_busy:')
             st.page_link(st.Page('_pages/register.py'), label='ลงทะเบียนเรียน', icon=':material/list_alt:')
             st.page_link(st.Page('_pages/timetable.py'), label='ตาราง', icon=':material/table_view:')
 
@@ -0,0 +1,51 @@
+-- Schema changes applied on top of the pic_2 database, oldest first.
+
+-- Required room type(s) per subject, comma separated. Empty = any room.
+ALTER TABLE subject ADD COLUMN room_type VARCHAR(255) NOT NULL DEFAULT '';
+
+-- Seats per room. NULL = unlimited; groups larger than capacity never use the room.
+ALTER TABLE room ADD COLUMN capacity INT NULL;
+
+-- Periods a teacher cannot teach. period NULL = the whole day.
+CREATE TABLE teacher_unavailable (
+    teacher_id VARCHAR(255) NOT NULL,
+    day VARCHAR(16) NOT NULL,
+    period INT NULL,
+    INDEX (teacher_id)
+);
+
+-- Blocked periods (lunch, homeroom, ...). NULL day = every day, NULL period = the whole day,
+-- NULL group_id and room_id = every group and room. label is shown in the rendered timetable.
+CREATE TABLE blocked_slot (
+    day VARCHAR(16) NULL,
+    period INT NULL,
+    group_id VARCHAR(255) NULL,
+    room_id VARCHAR(255) NULL,
+    label VARCHAR(255) NOT NULL DEFAULT ''
+);
+
+-- Replaces the hardcoded period-5 filter in the solver and the Wednesday period-6 homeroom in the HTML templates.
+INSERT INTO blocked_slot (day, period, label) VALUES (NULL, 5, 'พักกลางวัน'), ('Wed', 6, 'โฮมรูม');
+
+-- Timetable solve queue. The timetable page inserts jobs and worker.py runs them.
+-- active_key is set while a job is queued/running so identical submissions share one job.
+-- The worker refreshes heartbeat_at while a job runs; running jobs with a stale heartbeat are failed.
+-- stop_requested is set by the stop button; the worker ends the search and keeps the best timetable so far.
+CREATE TABLE solve_job (
+    job_id INT AUTO_INCREMENT PRIMARY KEY,
+    job_key CHAR(64) NOT NULL,
+    active_key CHAR(64) NULL UNIQUE,
+    options TEXT NOT NULL,
+    status VARCHAR(16) NOT NULL DEFAULT 'queued',
+    progress INT NOT NULL DEFAULT 0,
+    message VARCHAR(1000) NOT NULL DEFAULT '',
+    result TEXT NULL,
+    worker VARCHAR(255) NULL,
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    started_at DATETIME NULL,
+    finished_at DATETIME NULL,
+    heartbeat_at DATETIME NULL,
+    stop_requested BOOLEAN NOT NULL DEFAULT FALSE,
+    INDEX (status),
+    INDEX (job_key)
+);
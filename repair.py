@@ -0,0 +1,106 @@
+import argparse
+import os
+import scheduler
+import sys
+
+parser = argparse.ArgumentParser(description="Repair the current output after a teacher or room becomes unavailable, "
+                                             "moving as few classes as possible")
+parser.add_argument("--teacher", action="append", default=[],
+                    help="teacher who can no longer teach (repeatable)")
+parser.add_argument("--room", action="append", default=[],
+                    help="room that is closed (repeatable)")
+parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                    help="CP-SAT search workers (default: all cores)")
+parser.add_argument("--time-limit", type=float, default=60,
+                    help="total time limit in seconds over all neighborhoods (default: 60)")
+parser.add_argument("--seed", type=int, default=0, help="solver random seed")
+parser.add_argument("--dry-run", action="store_true",
+                    help="print the moved classes without saving the output table")
+
+
+def slot_name(data, i):
+    """ชื่อคาบเริ่ม เช่น Mon 3"""
+    t = data["timeslots"][i]
+    return f"{t['day']} {t['period']}"
+
+
+def main():
+    args = parser.parse_args()
+    lost = [("teacher", tid) for tid in args.teacher] + [("room", rid) for rid in args.room]
+
+    print("Loading data...")
+    print("="*60)
+    try:
+        data = scheduler.load_data(progress=print)
+        previous = scheduler.load_output_assignments(data)
+    except Exception as e:
+        print(f"✗ Error loading data: {e}")
+        sys.exit(1)
+    print(f"✓ Current output loaded: {len(previous)} classes")
+    for kind, res in lost:
+        print(f"✓ Unavailable {kind}: {res}")
+    data = scheduler.without_resources(data, lost)
+
+    # ======================
+    # PRE-CHECK
+    # ======================
+    print("\n" + "="*60)
+    print("Checking capacity...")
+    print("="*60)
+
+    problems = scheduler.precheck(data)
+    if problems:
+        print(f"✗ Pre-check failed with {len(problems)} problem(s), output left unchanged:")
+        for kind, name, message in problems:
+            print(f"  - [{kind}] {name}: {message}")
+        sys.exit(1)
+    print("✓ Groups, teachers, day blocks and rooms are within capacity")
+
+    # ======================
+    # REPAIR
+    # ======================
+    print("\n" + "="*60)
+    print(f"Repairing... (time limit {args.time_limit:g}s, {args.workers} workers, seed {args.seed})")
+    print("="*60)
+
+    def on_round(info):
+        print(f"  {info['ring']}: {info['freed']} classes free, {info['status_name']} at {info['wall_time']:.2f}s")
+
+    result = scheduler.repair(data, previous, args.time_limit, args.workers, args.seed, on_round)
+    print(f"Broken classes: {len(result['broken'])}")
+    print(f"Wall time: {result['wall_time']:.2f}s")
+
+    if result["assignments"] is None:
+        print("✗ No repair found, output left unchanged")
+        print("  Try a longer --time-limit or a full run of timetable.py")
+        sys.exit(1)
+
+    before = {(a[0], a[1]): a for a in previous}
+    print(f"✓ Repaired by moving {len(result['moved'])} classes (neighborhood: {result['ring']})")
+    moved = set(result["moved"])
+    for g, sid, tid, rid, i in sorted(a for a in result["assignments"] if (a[0], a[1]) in moved):
+        old = before.get((g, sid))
+        was = f"{slot_name(data, old[4])} {old[2]} {old[3]}" if old else "-"
+        print(f"  {g} {sid}: {was} -> {slot_name(data, i)} {tid} {rid}")
+
+    # ======================
+    # INSERT OUTPUT
+    # ======================
+    if args.dry_run:
+        print("\n--dry-run: output left unchanged")
+        return
+
+    print("\n" + "="*60)
+    print("Saving results...")
+    print("="*60)
+    try:
+        rows = scheduler.assignment_rows(result["pinned"] + result["assignments"], data)
+        scheduler.save_output(rows)
+        print(f"✓ Inserted {len(rows)} rows into output table")
+    except Exception as e:
+        print(f"✗ Error inserting data: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
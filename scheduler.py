@@ -0,0 +1,2255 @@
+from ortools.sat.python import cp_model
+from array import array
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from queue import Empty
+import gzip
+import hashlib
+import json
+import multiprocessing
+import os
+import pickle
+import time
+import numpy as np
+import db
+
+DEBUG_NAMES = False  # True: ตั้งชื่อตัวแปร x_{g}_{sid}_{tid}_{rid}_{i} ไว้อ่าน model ที่ export (ใช้หน่วยความจำมากขึ้น)
+
+
+# ======================
+# LOAD DATA
+# ======================
+def subject_hours(subject):
+    """จำนวนคาบของวิชา (ทฤษฎี + ปฏิบัติ)"""
+    return (subject["theory"] or 0) + (subject["practice"] or 0)
+
+
+def required_room_types(subject):
+    """ประเภทห้องที่วิชาต้องใช้ (room_type คั่นด้วย ,) ว่าง = ใช้ห้องไหนก็ได้"""
+    return {t.strip() for t in (subject.get("room_type") or "").split(",") if t.strip()}
+
+
+def load_data(progress=None):
+    """โหลดข้อมูลทั้งหมดที่ใช้สร้างตาราง"""
+    return inputs_data(load_inputs(progress))
+
+
+def load_inputs(progress=None):
+    """โหลดแถวดิบจากฐานข้อมูล (ยังไม่ตัดคาบที่ถูกปิด) ใช้กับ inputs_data() หรือ apply_scenario()"""
+    def step(msg):
+        if progress:
+            progress(msg)
+
+    step("Loading groups...")
+    groups = db.fetch_all("SELECT group_id, student_count FROM student_group")
+
+    step("Loading subjects...")
+    subjects = {s["subject_id"]: s for s in db.fetch_all("SELECT subject_id, theory, practice, room_type FROM subject")}
+
+    step("Loading timeslots...")
+    timeslots = db.fetch_all("""
+        SELECT timeslot_id, day, period
+        FROM timeslot
+        ORDER BY day, period
+    """)
+
+    step("Loading registrations...")
+    group_subjects = defaultdict(list)
+    for r in db.fetch_all("SELECT group_id, subject_id FROM register"):
+        group_subjects[r["group_id"]].append(r["subject_id"])
+
+    step("Loading teacher assignments...")
+    subject_teachers = defaultdict(list)
+    for r in db.fetch_all("SELECT subject_id, teacher_id FROM teach"):
+        subject_teachers[r["subject_id"]].append(r["teacher_id"])
+
+    step("Loading rooms...")
+    rooms = db.fetch_all("SELECT room_id, room_type, capacity FROM room")
+
+    step("Loading blocked slots...")
+    blocked_slots = db.fetch_all("SELECT day, period, group_id, room_id, label FROM blocked_slot")
+
+    step("Loading teacher availability...")
+    teacher_unavailable = defaultdict(list)
+    for r in db.fetch_all("SELECT teacher_id, day, period FROM teacher_unavailable"):
+        teacher_unavailable[r["teacher_id"]].append((r["day"], r["period"]))
+
+    return {
+        "groups": groups,
+        "subjects": subjects,
+        "timeslots": timeslots,
+        "blocked_slots": blocked_slots,
+        "group_subjects": group_subjects,
+        "subject_teachers": subject_teachers,
+        "rooms": rooms,
+        "teacher_unavailable": teacher_unavailable,
+    }
+
+
+def inputs_data(inputs):
+    """สร้าง data จากแถวดิบของ load_inputs() คาบที่ปิดทุกกลุ่มทุกห้อง (เช่น พักกลางวัน) ถูกตัดออกจาก timeslots เลย"""
+    blocked = [b for b in inputs["blocked_slots"] if not b.get("group_id") and not b.get("room_id")]
+    timeslots = [t for t in inputs["timeslots"] if not any(slot_matches(b.get("day"), b.get("period"), t) for b in blocked)]
+    return make_data(inputs["groups"], inputs["subjects"], timeslots, inputs["group_subjects"],
+                     inputs["subject_teachers"], inputs["rooms"], inputs.get("teacher_unavailable"),
+                     inputs["blocked_slots"])
+
+
+def slot_matches(day, period, timeslot):
+    """คาบ timeslot อยู่ใน (day, period) หรือไม่ (None = ทุกวัน / ทั้งวัน)"""
+    return (day is None or timeslot["day"] == day) and (period is None or timeslot["period"] == period)
+
+
+def make_data(groups, subjects, timeslots, group_subjects, subject_teachers, rooms, teacher_unavailable=None,
+              blocked_slots=None):
+    """รวมข้อมูลที่โหลดมาเป็น dict เดียว พร้อม mapping วัน -> คาบ และ วิชา -> ห้องที่ใช้ได้
+
+    teacher_unavailable = {teacher: [(day, period)]} คาบที่ครูสอนไม่ได้ (period None = ทั้งวัน) และ
+    blocked_slots = [{day, period, group_id, room_id}] ที่ระบุกลุ่ม/ห้อง ใส่ไว้ใน busy ตั้งแต่ต้น
+    ตัวแปรในคาบนั้นจึงไม่ถูกสร้างเลย
+    """
+    # สร้าง mapping: วัน -> [indices ของ timeslots ในวันนั้น]
+    day_timeslots = defaultdict(list)
+    for i, t in enumerate(timeslots):
+        day_timeslots[t["day"]].append(i)
+
+    # ตาราง block ที่ไม่ล้นวัน: starts[hours] = คาบเริ่มที่ใช้ได้, covers[start, hours] = คาบที่ block ครอบ
+    starts = defaultdict(list)
+    covers = {}
+    for day_slots in day_timeslots.values():
+        for pos, i in enumerate(day_slots):
+            # วิชา 0 ชั่วโมง (theory/practice ยังว่าง) ลงได้ทุกคาบโดยไม่ครอบคาบใด
+            starts[0].append(i)
+            covers[i, 0] = ()
+            for hours in range(1, len(day_slots) - pos + 1):
+                block = tuple(day_slots[pos:pos + hours])
+                if block[-1] - i != hours - 1:
+                    break  # คาบไม่ต่อเนื่อง block ที่ยาวกว่านี้ก็ใช้ไม่ได้
+                starts[hours].append(i)
+                covers[i, hours] = block
+
+    # ห้องที่ประเภทตรงกับที่วิชาต้องการ
+    subject_rooms = {}
+    for sid, s in subjects.items():
+        types = required_room_types(s)
+        subject_rooms[sid] = [r["room_id"] for r in rooms if not types or r["room_type"] in types]
+
+    busy = {"group": defaultdict(set), "teacher": defaultdict(set), "room": defaultdict(set)}
+    for tid, blocked in (teacher_unavailable or {}).items():
+        for day, period in blocked:
+            busy["teacher"][tid].update(i for i, t in enumerate(timeslots) if slot_matches(day, period, t))
+    for b in blocked_slots or ():
+        for kind in ("group", "room"):
+            if b.get(f"{kind}_id"):
+                busy[kind][b[f"{kind}_id"]].update(i for i, t in enumerate(timeslots)
+                                                   if slot_matches(b.get("day"), b.get("period"), t))
+
+    return {
+        "groups": [g["group_id"] for g in groups],
+        "group_sizes": {g["group_id"]: g["student_count"] or 0 for g in groups},
+        "subjects": subjects,
+        "timeslots": timeslots,
+        "ts_index": {t["timeslot_id"]: i for i, t in enumerate(timeslots)},
+        "day_timeslots": day_timeslots,
+        "periods_per_day": max((len(s) for s in day_timeslots.values()), default=0),
+        "valid_starts": {hours: sorted(s) for hours, s in starts.items()},
+        "covers": covers,
+        "group_subjects": group_subjects,
+        "subject_teachers": subject_teachers,
+        "rooms": [r["room_id"] for r in rooms],
+        "room_types": {r["room_id"]: r["room_type"] for r in rooms},
+        "room_capacity": {r["room_id"]: r.get("capacity") for r in rooms},
+        "subject_rooms": subject_rooms,
+        # คาบที่ถูกใช้ไปแล้ว (เช่น คาบของวิชาที่ตรึงไว้) แยกตาม group / teacher / room
+        "busy": busy,
+    }
+
+
+def rooms_for(data, g, sid):
+    """ห้องที่ประเภทตรงกับวิชาและจุนักเรียนทั้งกลุ่มได้ (capacity ว่าง = ไม่จำกัด)"""
+    size = data["group_sizes"].get(g, 0)
+    capacity = data["room_capacity"]
+    return [rid for rid in data["subject_rooms"][sid] if capacity.get(rid) is None or capacity[rid] >= size]
+
+
+def is_free(data, kind, res, i, hours):
+    """block [i, i+hours) ไม่ชนคาบที่ res ไม่ว่าง"""
+    busy = data["busy"][kind].get(res)
+    return not busy or busy.isdisjoint(data["covers"][i, hours])
+
+
+def busy_runs(data, kind, res):
+    """คาบไม่ว่างของ res รวมเป็นช่วงต่อเนื่อง [(start, length)]"""
+    runs = []
+    for t in sorted(data["busy"][kind].get(res, ())):
+        if runs and runs[-1][0] + runs[-1][1] == t:
+            runs[-1][1] += 1
+        else:
+            runs.append([t, 1])
+    return runs
+
+
+# ======================
+# CREATE VARIABLES
+# ======================
+def valid_starts(data, hours):
+    """คาบเริ่มต้นทั้งหมดที่ block ยาว hours คาบไม่ล้นวัน (ตารางสร้างไว้แล้วใน make_data)"""
+    return data["valid_starts"].get(hours, [])
+
+
+def schedulable_subjects(data, progress=None):
+    """วน (group, subject, hours, teachers, rooms) ที่ต้องจัด ข้ามวิชาที่ยาวเกินวัน"""
+    skipped_subjects = []
+    jobs = []
+
+    total_subjects = sum(len(data["group_subjects"].get(g, [])) for g in data["groups"])
+    counter = 0
+
+    for g in data["groups"]:
+        for sid in data["group_subjects"].get(g, []):
+            counter += 1
+            if progress:
+                progress(counter, total_subjects)
+            hours = subject_hours(data["subjects"][sid])
+
+            # ถ้าวิชามากกว่า periods ต่อวัน ให้ข้ามไป
+            if hours > data["periods_per_day"]:
+                skipped_subjects.append((g, sid, hours))
+                continue
+
+            teachers = data["subject_teachers"].get(sid, []) or ["T00"]  # dummy teacher
+            # ตัดครูที่ไม่ว่างทุก block ของวิชานี้ (ถ้าไม่เหลือใครเลย เก็บไว้ให้ precheck รายงาน)
+            teachers = [tid for tid in teachers
+                        if any(is_free(data, "teacher", tid, i, hours) for i in valid_starts(data, hours))] or teachers
+            jobs.append((g, sid, hours, teachers, rooms_for(data, g, sid)))
+
+    return jobs, skipped_subjects
+
+
+def create_variables(model, data, progress=None):
+    """สร้างตัวแปร x[group, subject, teacher, room, start] สำหรับทุก block ที่ไม่ล้นวัน
+
+    x เก็บแบบเข้ารหัสเป็นเลขจำนวนเต็ม: array ขนานกัน job/teacher/room/start/var ตามลำดับตัวแปร
+    (job = ตำแหน่งใน x["jobs"], teacher = ตำแหน่งใน x["teachers"], room = ตำแหน่งใน data["rooms"],
+    var = index ของตัวแปรในโมเดล)
+
+    วิชาที่มีครูหลายคนไม่คูณครูเข้าไปใน x (teacher = -1): เลือกครูด้วย choice[job, teacher] แยกต่างหาก
+    แล้วเชื่อมกับเวลาด้วย occupancy[teacher, job, start] => choice และ start ถูกเลือก (ใช้ทำ teacher no-overlap)
+    """
+    jobs, skipped_subjects = schedulable_subjects(data, progress)
+    forbidden = room_symmetry_limits(data, jobs)
+    teachers_all = sorted({tid for *_, teachers, _ in jobs for tid in teachers})
+    teacher_code = {tid: k for k, tid in enumerate(teachers_all)}
+    room_code = {rid: k for k, rid in enumerate(data["rooms"])}
+    columns = {name: array("i") for name in ("job", "teacher", "room", "start", "var")}
+    choice = {name: array("i") for name in ("job", "teacher", "var")}
+    occupancy = {name: array("i") for name in ("job", "teacher", "start", "var")}
+    lits = []
+    choice_lits = []
+    occupancy_lits = []
+
+    def new_x(j, tcode, rid, i, name):
+        lit = model.NewBoolVar(name if DEBUG_NAMES else "")
+        lits.append(lit)
+        for column, value in zip(columns.values(), (j, tcode, room_code[rid], i, lit.Index())):
+            column.append(value)
+        return lit
+
+    for j, (g, sid, hours, teachers, rooms) in enumerate(jobs):
+        rooms = [rid for rid in rooms if rid not in forbidden.get(j, ())]
+        chosen = {}
+        if len(teachers) > 1:
+            for tid in teachers:
+                chosen[tid] = model.NewBoolVar(f"teach_{g}_{sid}_{tid}" if DEBUG_NAMES else "")
+                choice_lits.append(chosen[tid])
+                for column, value in zip(choice.values(), (j, teacher_code[tid], chosen[tid].Index())):
+                    column.append(value)
+
+        for i in valid_starts(data, hours):
+            if not is_free(data, "group", g, i, hours):
+                continue
+            if not chosen:
+                tid = teachers[0]
+                if is_free(data, "teacher", tid, i, hours):
+                    for rid in rooms:
+                        if is_free(data, "room", rid, i, hours):
+                            new_x(j, teacher_code[tid], rid, i, f"x_{g}_{sid}_{tid}_{rid}_{i}")
+                continue
+
+            if not any(is_free(data, "teacher", tid, i, hours) for tid in chosen):
+                continue
+            room_lits = [new_x(j, -1, rid, i, f"x_{g}_{sid}_{rid}_{i}")
+                         for rid in rooms if is_free(data, "room", rid, i, hours)]
+            if not room_lits:
+                continue
+            starts_here = room_lits[0]
+            if len(room_lits) > 1:
+                starts_here = model.NewBoolVar("")
+                model.Add(sum(room_lits) == starts_here)
+            for tid, lit in chosen.items():
+                if not is_free(data, "teacher", tid, i, hours):
+                    model.AddBoolOr([lit.Not(), starts_here.Not()])
+                    continue
+                occupied = model.NewBoolVar(f"occ_{g}_{sid}_{tid}_{i}" if DEBUG_NAMES else "")
+                model.AddBoolOr([occupied, lit.Not(), starts_here.Not()])
+                occupancy_lits.append(occupied)
+                for column, value in zip(occupancy.values(), (j, teacher_code[tid], i, occupied.Index())):
+                    column.append(value)
+
+    x = {name: np.frombuffer(column, dtype=np.int32) for name, column in columns.items()}
+    x.update({f"choice_{name}": np.frombuffer(column, dtype=np.int32) for name, column in choice.items()})
+    x.update({f"occupancy_{name}": np.frombuffer(column, dtype=np.int32) for name, column in occupancy.items()})
+    x.update({
+        "lits": lits,
+        "choice_lits": choice_lits,
+        "occupancy_lits": occupancy_lits,
+        "jobs": [(g, sid, hours) for g, sid, hours, _, _ in jobs],
+        "teachers": teachers_all,
+        "restricted": len(forbidden),
+        "cliques": conflict_cliques(jobs),
+    })
+    return x, skipped_subjects
+
+
+# ======================
+# CONSTRAINTS
+# ======================
+def buckets(keys):
+    """แบ่งลำดับตัวแปรตาม key เดียวกัน คืน list ของ array (ใช้ argsort แทนการวน dict)"""
+    if not len(keys):
+        return []
+    order = np.argsort(keys, kind="stable")
+    bounds = np.flatnonzero(np.diff(keys[order])) + 1
+    return np.split(order, bounds)
+
+
+def expand_rows(hours, start):
+    """ขยายแถวละ hours แถว หนึ่งแถวต่อคาบที่ block ครอบ คืน (ลำดับแถวเดิม, คาบ)
+
+    start ที่ใช้ได้ทำให้คาบใน block ต่อเนื่องเสมอ
+    """
+    row = np.repeat(np.arange(len(hours)), hours)
+    slot = start[row] + np.arange(len(row)) - np.repeat(np.cumsum(hours) - hours, hours)
+    return row, slot
+
+
+def build_index(x, data):
+    """จัดตัวแปรลง bucket ด้วย array: (group, subject), (group, slot), (teacher, slot), (room, slot)
+
+    คืน dict ชื่อ -> list ของ array ตำแหน่งตัวแปร ตำแหน่งของ teacher นับ x["lits"] ต่อด้วย x["occupancy_lits"]
+    """
+    n_slots = len(data["timeslots"])
+    group_code = {g: k for k, g in enumerate(data["groups"])}
+    job_group = np.array([group_code[g] for g, _, _ in x["jobs"]], dtype=np.int64)
+    job_hours = np.array([hours for _, _, hours in x["jobs"]], dtype=np.int64)
+
+    row, slot = expand_rows(job_hours[x["job"]], x["start"])
+    occupancy_row, occupancy_slot = expand_rows(job_hours[x["occupancy_job"]], x["occupancy_start"])
+    fixed = x["teacher"][row] >= 0  # แถวของวิชาที่มีครูคนเดียว
+    teacher_member = np.concatenate([row[fixed], occupancy_row + len(x["job"])])
+    teacher_key = (np.concatenate([x["teacher"][row[fixed]], x["occupancy_teacher"][occupancy_row]]).astype(np.int64)
+                   * n_slots + np.concatenate([slot[fixed], occupancy_slot]))
+
+    return {
+        "subject": buckets(x["job"]),
+        "choice": buckets(x["choice_job"]),
+        "group": [row[b] for b in buckets(job_group[x["job"]][row] * n_slots + slot)],
+        "teacher": [teacher_member[b] for b in buckets(teacher_key)],
+        "room": [row[b] for b in buckets(x["room"][row].astype(np.int64) * n_slots + slot)],
+    }
+
+
+def add_constraints(model, x, data):
+    """เพิ่มข้อจำกัดทั้งหมดจาก index คืนค่าจำนวน constraint แต่ละประเภทและวิชาที่ไม่มีคาบลง"""
+    index = build_index(x, data)
+    lits = x["lits"]
+    counts = {}
+
+    # 1. Each subject must be scheduled exactly once (และเลือกครูหนึ่งคนถ้ามีหลายคน)
+    scheduled = set()
+    for members in index["subject"]:
+        model.AddExactlyOne([lits[k] for k in members])
+        scheduled.add(int(x["job"][members[0]]))
+    counts["subject"] = len(scheduled)
+    subjects_without_vars = [(g, sid) for j, (g, sid, _) in enumerate(x["jobs"]) if j not in scheduled]
+    for members in index["choice"]:
+        model.AddExactlyOne([x["choice_lits"][k] for k in members])
+
+    # 2-4. No overlap: GROUP / TEACHER / ROOM
+    for name, name_lits in (("group", lits), ("teacher", lits + x["occupancy_lits"]), ("room", lits)):
+        counts[name] = 0
+        for members in index[name]:
+            if len(members) > 1:
+                model.AddAtMostOne([name_lits[k] for k in members])
+                counts[name] += 1
+
+    # 5. (ซ้ำซ้อน) clique ข้ามทรัพยากร: แต่ละคาบมีวิชาใน clique ได้ไม่เกินหนึ่งวิชา
+    counts["clique"] = 0
+    job_hours = np.array([hours for _, _, hours in x["jobs"]], dtype=np.int64)
+    job_rows = {int(x["job"][members[0]]): members for members in index["subject"]}
+    for clique in x["cliques"]:
+        rows = np.concatenate([job_rows[j] for j in clique if j in job_rows] or [np.array([], dtype=np.int64)])
+        row, slot = expand_rows(job_hours[x["job"][rows]], x["start"][rows])
+        for members in buckets(slot):
+            if len(members) > 1:
+                model.AddAtMostOne([lits[k] for k in rows[row[members]]])
+                counts["clique"] += 1
+
+    return counts, subjects_without_vars
+
+
+# ======================
+# SYMMETRY
+# ======================
+def equivalent_groups(data):
+    """กลุ่มที่สลับตารางกันได้ทั้งชุด (วิชาเหมือนกัน ห้องที่ใช้ได้เหมือนกัน คาบไม่ว่างเหมือนกัน) คืน [[group, ...]]"""
+    classes = defaultdict(list)
+    for g in data["groups"]:
+        subjects = sorted(data["group_subjects"].get(g, []))
+        if not subjects or len(set(subjects)) < len(subjects):
+            continue
+        key = (tuple(subjects),
+               tuple(tuple(rooms_for(data, g, sid)) for sid in subjects),
+               frozenset(data["busy"]["group"].get(g, ())))
+        classes[key].append(g)
+    return [groups for groups in classes.values() if len(groups) > 1]
+
+
+def equivalent_rooms(data):
+    """ห้องที่สลับกันได้ (ประเภท ความจุ และคาบไม่ว่างเหมือนกัน) คืน [[room, ...]]"""
+    classes = defaultdict(list)
+    for rid in data["rooms"]:
+        key = (data["room_types"][rid], data["room_capacity"][rid], frozenset(data["busy"]["room"].get(rid, ())))
+        classes[key].append(rid)
+    return [rooms for rooms in classes.values() if len(rooms) > 1]
+
+
+def room_symmetry_limits(data, jobs):
+    """ตัดห้องที่สลับกันได้: ในชุดห้องเหมือนกัน [r1, r2, ...] วิชาลำดับที่ m ที่ใช้ชุดนี้ได้ ใช้ได้แค่ r1..r(m+1)
+
+    คำตอบใด ๆ สลับชื่อห้องในชุดให้เป็นแบบนี้ได้เสมอ โดยเวลาไม่เปลี่ยน คืน {ลำดับใน jobs: ห้องที่ตัดออก}
+    """
+    forbidden = defaultdict(set)
+    for rooms in equivalent_rooms(data):
+        m = 0
+        for j, (_, _, _, _, candidates) in enumerate(jobs):
+            if m >= len(rooms) - 1:
+                break
+            # ห้องในชุดเดียวกันเป็นตัวเลือกพร้อมกันทั้งชุดเสมอ (ประเภทและความจุเท่ากัน)
+            if rooms[0] in candidates:
+                forbidden[j].update(rooms[m + 1:])
+                m += 1
+    return dict(forbidden)
+
+
+def symmetry_subject(data, groups):
+    """วิชาที่ใช้เรียงกลุ่มที่สลับกันได้ (วิชาที่ยาวที่สุด)"""
+    return max(data["group_subjects"][groups[0]], key=lambda s: (subject_hours(data["subjects"][s]), s))
+
+
+def break_symmetry(model, data, start_of):
+    """กลุ่มที่สลับกันได้: คาบเริ่มของวิชาที่ยาวที่สุดเรียงจากน้อยไปมาก คืนจำนวน constraint ที่เพิ่ม
+
+    start_of(g, sid) -> expression ของคาบเริ่ม หรือ None ถ้าวิชานั้นไม่มีตัวแปร
+    """
+    count = 0
+    for groups in equivalent_groups(data):
+        sid = symmetry_subject(data, groups)
+        starts = [start_of(g, sid) for g in groups]
+        if any(start is None for start in starts):
+            continue
+        for earlier, later in zip(starts, starts[1:]):
+            model.Add(earlier <= later)
+            count += 1
+    return count
+
+
+def symmetric_hints(data, assignments):
+    """สลับตารางของกลุ่มที่เหมือนกัน และสลับชื่อห้องในชุดห้องเหมือนกัน ให้ assignments ผ่าน break_symmetry()
+    และ room_symmetry_limits()
+
+    ตารางที่ได้ใช้ได้เหมือนเดิม (แค่เปลี่ยนชื่อกลุ่ม/ห้องที่สลับกันได้) แต่ไม่ถูก symmetry cut ตัดทิ้ง
+    จึงใช้เป็น hint ของโมเดลที่ตัด symmetry ได้ (เช่น output เดิม หรือร่างจาก greedy)
+    """
+    by_class = {(a[0], a[1]): a for a in assignments}
+
+    # กลุ่ม: เรียงตามคาบเริ่มของวิชาที่ยาวที่สุด (เฉพาะกลุ่มที่มี hint ของวิชานั้น) แล้วย้ายตารางทั้งชุดตามลำดับ
+    for groups in equivalent_groups(data):
+        sid = symmetry_subject(data, groups)
+        hinted = [g for g in groups if (g, sid) in by_class]
+        order = sorted(hinted, key=lambda g: by_class[g, sid][4])
+        schedules = {g: [by_class.pop((g, s)) for s in data["group_subjects"][g] if (g, s) in by_class]
+                     for g in hinted}
+        for g, source in zip(hinted, order):
+            for _, s, tid, rid, i in schedules[source]:
+                by_class[g, s] = (g, s, tid, rid, i)
+
+    # ห้อง: ไล่วิชาตามลำดับเดียวกับ room_symmetry_limits ห้องในชุดที่เจอครั้งแรกได้ชื่อห้องถัดไปของชุด
+    jobs, _ = schedulable_subjects(data)
+    for rooms in equivalent_rooms(data):
+        rename = {}
+        for g, sid, _, _, candidates in jobs:
+            a = by_class.get((g, sid))
+            if rooms[0] in candidates and a and a[3] in rooms and a[3] not in rename:
+                rename[a[3]] = rooms[len(rename)]
+        spare = [rid for rid in rooms if rid not in rename.values()]
+        rename.update(zip([rid for rid in rooms if rid not in rename], spare))
+        for key, (g, sid, tid, rid, i) in by_class.items():
+            if rid in rename:
+                by_class[key] = (g, sid, tid, rename[rid], i)
+    return list(by_class.values())
+
+
+def symmetry_canonical(data):
+    """built["canonical"] ของโมเดลที่ตัด symmetry ด้วย data นี้: แปลง hint ให้ผ่าน symmetry cut (symmetric_hints)"""
+    return lambda assignments: symmetric_hints(data, assignments)
+
+
+# ======================
+# CONFLICT CLIQUES
+# ======================
+def conflict_cliques(jobs, max_cliques=200, max_search=20000):
+    """clique ของวิชา (ลำดับใน jobs) ที่ต้องไม่ชนเวลากันทุกคู่ เพราะใช้กลุ่มเดียวกัน หรือครู/ห้องที่มีทางเลือกเดียวร่วมกัน
+
+    คืนเฉพาะ clique สูงสุด (Bron-Kerbosch) ที่มีอย่างน้อย 3 วิชาและไม่ได้อยู่ในทรัพยากรเดียว (ซึ่งมี no-overlap อยู่แล้ว)
+    เรียงชั่วโมงรวมมากไปน้อย ไม่เกิน max_cliques ชุด หยุดค้นเมื่อเจอครบ max_search ชุด
+    """
+    resources = []
+    members = defaultdict(set)
+    for j, (g, _, _, teachers, rooms) in enumerate(jobs):
+        own = {("group", g)}
+        if len(teachers) == 1:
+            own.add(("teacher", teachers[0]))
+        if len(rooms) == 1:
+            own.add(("room", rooms[0]))
+        resources.append(own)
+        for res in own:
+            members[res].add(j)
+    neighbors = [set().union(*(members[res] for res in own)) - {j} for j, own in enumerate(resources)]
+
+    found = []
+
+    def expand(clique, candidates, excluded):
+        if len(found) >= max_search:
+            return
+        if not candidates and not excluded:
+            if len(clique) >= 3 and not set.intersection(*(resources[j] for j in clique)):
+                found.append(clique)
+            return
+        pivot = max(candidates | excluded, key=lambda v: len(neighbors[v] & candidates))
+        for v in list(candidates - neighbors[pivot]):
+            expand(clique + [v], candidates & neighbors[v], excluded & neighbors[v])
+            candidates.discard(v)
+            excluded.add(v)
+
+    expand([], {j for j in range(len(jobs)) if neighbors[j]}, set())
+    found.sort(key=lambda clique: -sum(jobs[j][2] for j in clique))
+    return found[:max_cliques]
+
+
+# ======================
+# PRE-CHECK
+# ======================
+def precheck(data):
+    """ตรวจความจุแบบเร็วก่อนสร้างโมเดล คืนรายการปัญหา [(kind, name, message)] ว่าง = ผ่าน
+
+    ตรวจ: ชั่วโมงรวมของกลุ่ม, ภาระครู (วิชาที่มีครูคนเดียว), block ยาวเกินครึ่งวันต่อกลุ่ม,
+    วิชาที่ไม่มีคาบ/ห้องลงได้, ชั่วโมงรวมของ clique วิชาที่ชนกันทุกคู่
+    และจำนวนคาบเรียนพร้อมกันเทียบกับจำนวนห้อง (แยกตามชุดห้องที่ใช้ได้)
+    """
+    problems = []
+    jobs, skipped_subjects = schedulable_subjects(data)
+    n_slots = len(data["timeslots"])
+    n_days = len(data["day_timeslots"])
+
+    for g, sid, hours in skipped_subjects:
+        problems.append(("class", f"{g} {sid}", f"needs {hours} consecutive periods but a day has only {data['periods_per_day']}"))
+
+    group_hours = defaultdict(int)
+    group_long_blocks = defaultdict(int)
+    teacher_hours = defaultdict(int)
+    room_set_hours = defaultdict(int)
+    for g, sid, hours, teachers, rooms in jobs:
+        group_hours[g] += hours
+        # block ยาวเกินครึ่งวันสองวิชาอยู่วันเดียวกันไม่ได้
+        if hours * 2 > data["periods_per_day"]:
+            group_long_blocks[g] += 1
+        if len(teachers) == 1:
+            teacher_hours[teachers[0]] += hours
+        room_set_hours[frozenset(rooms)] += hours
+
+        if not rooms:
+            problems.append(("class", f"{g} {sid}", "no room matches the required room type and group size"))
+        elif not any(is_free(data, "group", g, i, hours) for i in valid_starts(data, hours)):
+            problems.append(("class", f"{g} {sid}", f"no free block of {hours} periods for the group"))
+        elif not any(is_free(data, "group", g, i, hours) and any(is_free(data, "teacher", tid, i, hours) for tid in teachers)
+                     for i in valid_starts(data, hours)):
+            problems.append(("class", f"{g} {sid}", f"no teacher is available when the group has a free block of {hours} periods"))
+
+    for g, hours in group_hours.items():
+        available = n_slots - len(data["busy"]["group"].get(g, ()))
+        if hours > available:
+            problems.append(("group", g, f"{hours} hours registered but only {available} periods available"))
+        if group_long_blocks[g] > n_days:
+            problems.append(("group", g, f"{group_long_blocks[g]} classes longer than half a day but only {n_days} days"))
+
+    for tid, hours in teacher_hours.items():
+        available = n_slots - len(data["busy"]["teacher"].get(tid, ()))
+        if hours > available:
+            problems.append(("teacher", tid, f"{hours} hours to teach but only {available} periods available"))
+
+    # วิชาที่ชนกันทุกคู่ผ่านกลุ่ม/ครู/ห้องต่างกัน ต้องเรียงกันในสัปดาห์เดียว
+    for clique in conflict_cliques(jobs):
+        hours = sum(jobs[j][2] for j in clique)
+        if hours > n_slots:
+            names = ", ".join(f"{jobs[j][0]} {jobs[j][1]}" for j in clique)
+            problems.append(("clique", names, f"{hours} hours of pairwise-conflicting classes but only {n_slots} periods"))
+
+    # คาบเรียนที่ใช้ได้เฉพาะห้องในชุด S ต้องไม่เกิน |S| x จำนวนคาบ
+    for room_set in {rs for rs in room_set_hours if rs} | {frozenset(data["rooms"])}:
+        hours = sum(h for rs, h in room_set_hours.items() if rs and rs <= room_set)
+        available = sum(n_slots - len(data["busy"]["room"].get(rid, ())) for rid in room_set)
+        if hours > available:
+            names = "all rooms" if room_set == frozenset(data["rooms"]) else ", ".join(sorted(room_set))
+            problems.append(("rooms", names, f"{hours} class-periods need these rooms but only {available} room-periods exist"))
+
+    return problems
+
+
+# ======================
+# ENGINES
+# ======================
+def build_boolean_model(data, progress=None):
+    """โมเดลแบบ BoolVar ต่อ (group, subject, teacher, room, start) + AtMostOne ต่อคาบ"""
+    model = cp_model.CpModel()
+    x, skipped_subjects = create_variables(model, data, progress)
+    counts, subjects_without_vars = add_constraints(model, x, data)
+    subjects_without_vars += [(g, sid) for g, sid, _ in skipped_subjects]
+
+    by_job = {(g, sid): j for j, (g, sid, _) in enumerate(x["jobs"])}
+    job_rows = {int(x["job"][members[0]]): members for members in buckets(x["job"])}
+
+    def start_of(g, sid):
+        rows = job_rows.get(by_job.get((g, sid)))
+        if rows is None:
+            return None
+        return cp_model.LinearExpr.WeightedSum([x["lits"][k] for k in rows], x["start"][rows].tolist())
+
+    counts["symmetry"] = x["restricted"] + break_symmetry(model, data, start_of)
+    layout = {name: x[name] for name in ("job", "teacher", "room", "start", "var",
+                                          "choice_job", "choice_teacher", "choice_var",
+                                          "occupancy_job", "occupancy_teacher", "occupancy_start", "occupancy_var",
+                                          "jobs", "teachers")}
+    layout["rooms"] = list(data["rooms"])
+    return {
+        "model": model,
+        "counts": counts,
+        "skipped_subjects": skipped_subjects,
+        "subjects_without_vars": subjects_without_vars,
+        "layout": layout,
+        "canonical": symmetry_canonical(data),
+        **boolean_handlers(model, layout),
+    }
+
+
+def boolean_handlers(model, layout):
+    """decode/hint ของโมเดล BoolVar จาก layout (array job/teacher/room/start/var + ตารางแปลงรหัสกลับเป็น id)
+
+    decode รับ solution เป็น list ค่าตัวแปรตาม index (ใช้ได้ทั้งโมเดลที่สร้างใหม่และโหลดจาก cache)
+    แถวที่ teacher = -1 อ่านครูจาก choice ของ job นั้น
+    """
+    jobs, teachers, rooms = layout["jobs"], layout["teachers"], layout["rooms"]
+
+    def decode(solution):
+        solution = np.asarray(solution)
+        chosen = np.flatnonzero(solution[layout["var"]] == 1)
+        picked = np.flatnonzero(solution[layout["choice_var"]] == 1)
+        teacher_of = dict(zip(layout["choice_job"][picked].tolist(), layout["choice_teacher"][picked].tolist()))
+        return [(jobs[j][0], jobs[j][1], teachers[t if t >= 0 else teacher_of[j]], rooms[r], i)
+                for j, t, r, i in zip(layout["job"][chosen].tolist(), layout["teacher"][chosen].tolist(),
+                                      layout["room"][chosen].tolist(), layout["start"][chosen].tolist())]
+
+    def hint(assignments):
+        # เข้ารหัส (job, teacher + 1, room, start) เป็นเลขเดียว แล้วหาตำแหน่งด้วย searchsorted
+        shape = (len(jobs), len(teachers) + 1, len(rooms), int(layout["start"].max(initial=0)) + 1)
+        codes = np.ravel_multi_index((layout["job"], layout["teacher"] + 1, layout["room"], layout["start"]), shape)
+        order = np.argsort(codes)
+        job_code = {(g, sid): j for j, (g, sid, _) in enumerate(jobs)}
+        teacher_code = {tid: k for k, tid in enumerate(teachers)}
+        room_code = {rid: k for k, rid in enumerate(rooms)}
+        choice_var = {(j, t): v for j, t, v in zip(layout["choice_job"].tolist(), layout["choice_teacher"].tolist(),
+                                                    layout["choice_var"].tolist())}
+        count = 0
+        for g, sid, tid, rid, i in assignments:
+            if (g, sid) not in job_code or tid not in teacher_code or rid not in room_code or not 0 <= i < shape[3]:
+                continue
+            j, t = job_code[g, sid], teacher_code[tid]
+            factored = (j, t) in choice_var
+            key = np.ravel_multi_index((j, 0 if factored else t + 1, room_code[rid], i), shape)
+            pos = np.searchsorted(codes, key, sorter=order)
+            if pos < len(codes) and codes[order[pos]] == key:
+                model.AddHint(model.GetBoolVarFromProtoIndex(int(layout["var"][order[pos]])), 1)
+                if factored:
+                    model.AddHint(model.GetBoolVarFromProtoIndex(choice_var[j, t]), 1)
+                count += 1
+        return count
+
+    return {"decode": decode, "hint": hint}
+
+
+def build_interval_model(data, progress=None, room_pool=False, guarded=False, symmetry=True):
+    """โมเดลแบบ interval ต่อ (group, subject) + AddNoOverlap ต่อกลุ่ม ครู และห้อง
+
+    room_pool=True: ไม่เลือกห้อง ใช้ AddCumulative จำกัดจำนวนคาบพร้อมกันไม่เกินจำนวนห้อง (แยกตามชุดประเภทห้อง) แทน
+    guarded=True: ใช้ตอนวิเคราะห์ infeasible ทุก interval ใน AddNoOverlap ของ group/teacher/room เป็น optional
+    ที่อยู่จริงเฉพาะเมื่อ assumption literal ของทรัพยากรนั้นเป็นจริง (AddNoOverlap ใส่ OnlyEnforceIf ไม่ได้)
+    literal อยู่ใน built["guards"]
+    symmetry=False: ไม่ตัด symmetry ของกลุ่ม/ห้อง (ใช้ตอนซ่อมตาราง ที่ต้องให้ทุกวิชาอยู่ที่เดิมได้)
+    """
+    model = cp_model.CpModel()
+    jobs, skipped_subjects = schedulable_subjects(data, progress)
+    by_group = defaultdict(list)
+    by_teacher = defaultdict(list)
+    by_room = defaultdict(list)
+    pool = []
+    guards = {}  # (kind, name) -> assumption literal
+    job_intervals = {}  # ลำดับใน jobs -> interval หลัก
+    tasks = []  # (group, subject, start, {teacher: lit}, {room: lit})
+    subjects_without_vars = []
+
+    def presence(name, res, lit=True):
+        """literal ที่ interval อยู่ใน no-overlap ของ res (guarded: ต้องเปิด assumption ของ res ด้วย)"""
+        if not guarded:
+            return lit
+        if (name, res) not in guards:
+            guards[name, res] = model.NewBoolVar(f"assume_{name}_{res}")
+        if lit is True:
+            return guards[name, res]
+        both = model.NewBoolVar("")
+        model.AddBoolAnd([guards[name, res], lit]).OnlyEnforceIf(both)
+        model.AddBoolOr([guards[name, res].Not(), lit.Not(), both])
+        return both
+
+    def member(name, res, start, hours, interval, lit=True):
+        """interval ของวิชาใน no-overlap ของ res (lit = ทางเลือกครู/ห้องนี้ True ถ้ามีทางเดียว)"""
+        lit = presence(name, res, lit)
+        if lit is True:
+            return interval
+        return model.NewOptionalFixedSizeIntervalVar(start, hours, lit, "")
+
+    # ไม่ตัด symmetry ตอนวิเคราะห์ infeasible: assumption ที่ต่างกันต่อกลุ่ม/ห้องทำให้สลับกันไม่ได้
+    forbidden = room_symmetry_limits(data, jobs) if symmetry and not (guarded or room_pool) else {}
+    for j, (g, sid, hours, teachers, rooms) in enumerate(jobs):
+        rooms = [rid for rid in rooms if rid not in forbidden.get(j, ())]
+        # ตัด start ที่กลุ่มไม่ว่าง ห้องที่มีทางเลือกเดียวไม่ว่าง หรือไม่มีครูคนไหนว่าง
+        must_free = [("group", g)]
+        if len(rooms) == 1 and not room_pool:
+            must_free.append(("room", rooms[0]))
+        starts = [i for i in valid_starts(data, hours)
+                  if all(is_free(data, kind, res, i, hours) for kind, res in must_free)
+                  and any(is_free(data, "teacher", tid, i, hours) for tid in teachers)]
+        if not starts or not rooms:
+            subjects_without_vars.append((g, sid))
+            continue
+
+        start = model.NewIntVarFromDomain(cp_model.Domain.FromValues(starts), f"start_{g}_{sid}")
+        interval = model.NewFixedSizeIntervalVar(start, hours, f"iv_{g}_{sid}")
+        by_group[g].append(member("group", g, start, hours, interval))
+        job_intervals[j] = interval
+
+        # ตัวเลือกครู/ห้อง: optional interval ต่อทางเลือก เลือกได้ทางเดียว
+        choices = []
+        resource_choices = [(teachers, by_teacher, "teacher")]
+        if room_pool:
+            pool.append((interval, frozenset(rooms)))
+        else:
+            resource_choices.append((rooms, by_room, "room"))
+        for resources, index, name in resource_choices:
+            if len(resources) == 1:
+                index[resources[0]].append(member(name, resources[0], start, hours, interval))
+                choices.append({resources[0]: True})
+                continue
+            lits = {}
+            for res in resources:
+                lit = model.NewBoolVar(f"{name[0]}_{g}_{sid}_{res}")
+                index[res].append(model.NewOptionalFixedSizeIntervalVar(start, hours, presence(name, res, lit),
+                                                                        f"iv_{g}_{sid}_{res}"))
+                lits[res] = lit
+            model.AddExactlyOne(lits.values())
+            choices.append(lits)
+        if room_pool:
+            choices.append({None: True})
+
+        tasks.append((g, sid, start, choices[0], choices[1]))
+    subjects_without_vars += [(g, sid) for g, sid, _ in skipped_subjects]
+
+    counts = {"subject": len(tasks)}
+    for name, index in (("group", by_group), ("teacher", by_teacher), ("room", by_room)):
+        counts[name] = 0
+        for res, intervals in index.items():
+            # คาบที่ไม่ว่างอยู่แล้วเป็น interval คงที่
+            runs = busy_runs(data, name, res)
+            if len(intervals) + len(runs) > 1:
+                intervals = intervals + [member(name, res, t, length, model.NewFixedSizeIntervalVar(t, length, ""))
+                                         for t, length in runs]
+                model.AddNoOverlap(intervals)
+                counts[name] += 1
+    # (ซ้ำซ้อน) clique ข้ามทรัพยากร ไม่ใส่ตอนวิเคราะห์ infeasible เพราะจะไม่ซ้ำซ้อนเมื่อปิด assumption บางตัว
+    counts["clique"] = 0
+    for clique in conflict_cliques(jobs) if not guarded else []:
+        intervals = [job_intervals[j] for j in clique if j in job_intervals]
+        if len(intervals) > 2:
+            model.AddNoOverlap(intervals)
+            counts["clique"] += 1
+
+    counts["symmetry"] = len(forbidden)
+    if symmetry and not guarded:
+        starts = {(g, sid): start for g, sid, start, _, _ in tasks}
+        counts["symmetry"] += break_symmetry(model, data, lambda g, sid: starts.get((g, sid)))
+
+    # คาบที่ใช้ได้เฉพาะห้องในชุด S เรียนพร้อมกันได้ไม่เกิน |S| ห้อง
+    for room_set in {rs for _, rs in pool} | {frozenset(data["rooms"])}:
+        intervals = [iv for iv, rs in pool if rs <= room_set]
+        if not intervals:
+            continue
+        intervals += [model.NewFixedSizeIntervalVar(t, length, "")
+                      for rid in room_set for t, length in busy_runs(data, "room", rid)]
+        if len(intervals) > len(room_set):
+            model.AddCumulative(intervals, [1] * len(intervals), len(room_set))
+
+    def index(lits):
+        return {res: lit if lit is True else lit.Index() for res, lit in lits.items()}
+
+    layout = [(g, sid, start.Index(), index(t_lits), index(r_lits)) for g, sid, start, t_lits, r_lits in tasks]
+    return {
+        "model": model,
+        "counts": counts,
+        "skipped_subjects": skipped_subjects,
+        "subjects_without_vars": subjects_without_vars,
+        "guards": guards,
+        "layout": layout,
+        "canonical": symmetry_canonical(data) if symmetry and not guarded else None,
+        **interval_handlers(model, layout),
+    }
+
+
+def interval_handlers(model, layout):
+    """decode/hint ของโมเดล interval จาก layout [(group, subject, start, {teacher: lit}, {room: lit})]
+
+    start และ lit เป็น index ของตัวแปร (lit เป็น True เมื่อมีทางเลือกเดียว)
+    """
+    def decode(solution):
+        def chosen(lits):
+            return next(res for res, lit in lits.items() if lit is True or solution[lit] == 1)
+        return [(g, sid, chosen(t_lits), chosen(r_lits), solution[start])
+                for g, sid, start, t_lits, r_lits in layout]
+
+    def hint(assignments):
+        previous = {(a[0], a[1]): a for a in assignments}
+        count = 0
+        for g, sid, start, t_lits, r_lits in layout:
+            if (g, sid) not in previous:
+                continue
+            _, _, tid, rid, i = previous[g, sid]
+            model.AddHint(model.GetIntVarFromProtoIndex(start), i)
+            for res, lits in ((tid, t_lits), (rid, r_lits)):
+                for key, lit in lits.items():
+                    if lit is not True:
+                        model.AddHint(model.GetBoolVarFromProtoIndex(lit), key == res)
+            # นับเฉพาะ hint ที่โมเดลเลือกได้จริง (คาบเริ่มอยู่ใน domain ครูและห้องยังเป็นตัวเลือก room_pool ไม่เลือกห้อง)
+            domain = list(model.Proto().variables[start].domain)
+            if (tid in t_lits and (rid in r_lits or None in r_lits)
+                    and any(lo <= i <= hi for lo, hi in zip(domain[::2], domain[1::2]))):
+                count += 1
+        return count
+
+    def keep(assignments):
+        """literal ต่อ (group, subject) ที่เป็นจริงเมื่อวิชาอยู่ที่เดิมทั้งเวลา ครู และห้องตาม assignments"""
+        previous = {(a[0], a[1]): a for a in assignments}
+        kept = {}
+        for g, sid, start, t_lits, r_lits in layout:
+            if (g, sid) not in previous:
+                continue
+            _, _, tid, rid, i = previous[g, sid]
+            if tid not in t_lits or rid not in r_lits:
+                continue
+            lit = model.NewBoolVar("")
+            model.Add(model.GetIntVarFromProtoIndex(start) == i).OnlyEnforceIf(lit)
+            for res, lits in ((tid, t_lits), (rid, r_lits)):
+                if lits[res] is not True:
+                    model.AddImplication(lit, model.GetBoolVarFromProtoIndex(lits[res]))
+            kept[g, sid] = lit
+        return kept
+
+    return {"decode": decode, "hint": hint, "keep": keep}
+
+
+def build_two_stage_model(data, progress=None):
+    """ขั้นที่ 1 จัดเวลาและครูโดยจำกัดจำนวนห้องต่อคาบ ขั้นที่ 2 จับคู่ห้องทีละคาบ"""
+    built = build_interval_model(data, progress, room_pool=True)
+    built["finish"] = two_stage_finish(data)
+    return built
+
+
+def two_stage_finish(data):
+    return lambda assignments: assign_rooms(assignments, data) or assign_rooms_exact(assignments, data)
+
+
+ENGINES = {
+    "boolean": build_boolean_model,
+    "interval": build_interval_model,
+    "two_stage": build_two_stage_model,
+}
+
+
+def build_model(data, engine="boolean", progress=None, cache=False, quality=False):
+    """สร้างโมเดลด้วย engine ที่เลือก
+
+    cache=True: ถ้าข้อมูลนำเข้าเหมือนรอบก่อน โหลดโมเดลจาก cache แทนการสร้างใหม่ และ solve() จะใช้/เก็บคำตอบใน cache ด้วย
+    quality=True: เพิ่ม objective ลดคาบว่างและการย้ายห้อง (add_quality_objective) แทนการหาแค่ตารางที่ใช้ได้
+    """
+    key = fingerprint(data, engine, quality) if cache else None
+    built = load_cached_model(key, data, engine) if key else None
+    if built:
+        if progress:
+            progress(1, 1)
+    else:
+        built = ENGINES[engine](data, progress)
+        built["engine"] = engine
+        if quality:
+            built["counts"]["objective"] = add_quality_objective(built, data)
+        if key:
+            store_model(key, built)
+    built["fingerprint"] = key
+    return built
+
+
+# ======================
+# QUALITY OBJECTIVE
+# ======================
+QUALITY_WEIGHTS = {"gap": 2, "room": 1}  # น้ำหนักต่อคาบว่างระหว่างวันของกลุ่ม/ครู และต่อห้องที่กลุ่มต้องย้ายไปใช้
+
+
+def idle_lits(model, data, by_slot):
+    """literal ต่อคาบว่างระหว่างคาบแรกถึงคาบสุดท้ายที่ใช้ในวันเดียวกัน
+
+    by_slot = {slot: [lit]} literal ที่บอกว่าคาบนั้นถูกใช้ (ผลรวมต้องเท่ากับการใช้จริงพอดี 0 หรือ 1)
+    before[t]/after[t] = มีคาบที่ใช้ก่อน/หลัง t (รวม t) ในวันเดียวกัน idle[t] >= before + after - 1 - ใช้คาบ t
+    """
+    result = []
+    for day_slots in data["day_timeslots"].values():
+        used = [pos for pos, t in enumerate(day_slots) if by_slot.get(t)]
+        if len(used) < 2 or used[-1] - used[0] < 2:
+            continue  # คาบที่อาจใช้ติดกันหมด ไม่มีทางเกิดคาบว่าง
+        slots = day_slots[used[0]:used[-1] + 1]
+        before, after = [], []
+        for chain, order in ((before, slots), (after, slots[::-1])):
+            for t in order:
+                lit = model.NewBoolVar("")
+                for used_lit in by_slot.get(t, []):
+                    model.AddImplication(used_lit, lit)
+                if chain:
+                    model.AddImplication(chain[-1], lit)
+                chain.append(lit)
+        after.reverse()
+        for k in range(1, len(slots) - 1):
+            idle = model.NewBoolVar("")
+            model.Add(idle >= before[k] + after[k] - 1 - cp_model.LinearExpr.Sum(by_slot.get(slots[k], [])))
+            result.append(idle)
+    return result
+
+
+def boolean_occupancy(model, layout, data):
+    """occupancy {(kind, res): {slot: [lit]}} ของกลุ่ม/ครู และ room_usage {(group, room): [[lit ต่อวิชา]]} จาก layout ของโมเดล BoolVar"""
+    n_slots = len(data["timeslots"])
+    groups = sorted({g for g, _, _ in layout["jobs"]})
+    group_code = {g: k for k, g in enumerate(groups)}
+    job_group = np.array([group_code[g] for g, _, _ in layout["jobs"]], dtype=np.int64)
+    job_hours = np.array([hours for _, _, hours in layout["jobs"]], dtype=np.int64)
+    occupancy = defaultdict(dict)
+
+    def collect(kind, names, codes, slots, var):
+        for members in buckets(codes.astype(np.int64) * n_slots + slots):
+            k = members[0]
+            occupancy[kind, names[codes[k]]][int(slots[k])] = [model.GetBoolVarFromProtoIndex(v)
+                                                              for v in var[members].tolist()]
+
+    row, slot = expand_rows(job_hours[layout["job"]], layout["start"])
+    collect("group", groups, job_group[layout["job"]][row], slot, layout["var"][row])
+    occupancy_row, occupancy_slot = expand_rows(job_hours[layout["occupancy_job"]], layout["occupancy_start"])
+    fixed = layout["teacher"][row] >= 0
+    collect("teacher", layout["teachers"],
+            np.concatenate([layout["teacher"][row[fixed]], layout["occupancy_teacher"][occupancy_row]]),
+            np.concatenate([slot[fixed], occupancy_slot]),
+            np.concatenate([layout["var"][row[fixed]], layout["occupancy_var"][occupancy_row]]))
+
+    # occupancy ของครูหลายคนเดิมบังคับแค่ทางเดียว (เลือกครูและเริ่มที่ start => ใช้คาบ) ใส่ทางกลับให้นับคาบได้ตรง
+    starts_here = {}
+    for members in buckets(layout["job"].astype(np.int64) * n_slots + layout["start"]):
+        k = members[0]
+        starts_here[int(layout["job"][k]), int(layout["start"][k])] = [
+            model.GetBoolVarFromProtoIndex(v) for v in layout["var"][members].tolist()]
+    choice = {(j, t): v for j, t, v in zip(layout["choice_job"].tolist(), layout["choice_teacher"].tolist(),
+                                           layout["choice_var"].tolist())}
+    for j, t, i, v in zip(layout["occupancy_job"].tolist(), layout["occupancy_teacher"].tolist(),
+                          layout["occupancy_start"].tolist(), layout["occupancy_var"].tolist()):
+        occupied = model.GetBoolVarFromProtoIndex(v)
+        model.AddImplication(occupied, model.GetBoolVarFromProtoIndex(choice[j, t]))
+        model.Add(occupied <= cp_model.LinearExpr.Sum(starts_here[j, i]))
+
+    room_usage = defaultdict(list)
+    for members in buckets(layout["job"].astype(np.int64) * len(layout["rooms"]) + layout["room"]):
+        k = members[0]
+        g = layout["jobs"][layout["job"][k]][0]
+        room_usage[g, layout["rooms"][layout["room"][k]]].append(
+            [model.GetBoolVarFromProtoIndex(v) for v in layout["var"][members].tolist()])
+    return occupancy, room_usage
+
+
+def interval_gaps(model, layout, data):
+    """คาบว่างต่อ (กลุ่ม/ครู, วัน) ของโมเดล interval คืน ([IntVar คาบว่าง], room_usage แบบ boolean_occupancy)
+
+    ไม่แตกเป็น literal ต่อคาบเริ่ม (probing ช้ามาก) ใช้ literal วันต่อวิชาแทน:
+    first <= start และ last >= start + hours ของวิชาที่ลงวันนั้น, คาบว่าง >= last - first - ชั่วโมงที่ลงวันนั้น
+    """
+    proto = model.Proto()
+    tasks = defaultdict(list)  # (kind, res, day) -> [(start, hours, literal)]
+    room_usage = defaultdict(list)
+    for g, sid, start_index, t_lits, r_lits in layout:
+        hours = subject_hours(data["subjects"][sid])
+        start = model.GetIntVarFromProtoIndex(start_index)
+        domain = list(proto.variables[start_index].domain)
+        starts = [i for lo, hi in zip(domain[::2], domain[1::2]) for i in range(lo, hi + 1)]
+        on_day = {}
+        for day, day_slots in data["day_timeslots"].items():
+            if any(i in day_slots for i in starts):
+                on_day[day] = model.NewBoolVar("")
+                model.AddLinearConstraint(start, day_slots[0], day_slots[-1]).OnlyEnforceIf(on_day[day])
+        model.AddExactlyOne(on_day.values())
+
+        for day, lit in on_day.items():
+            tasks["group", g, day].append((start, hours, lit))
+            for tid, t_lit in t_lits.items():
+                taught = lit
+                if t_lit is not True:
+                    # ครูหลายคน: สอนวันนี้ก็ต่อเมื่อเลือกครูคนนี้และลงวันนี้
+                    chosen = model.GetBoolVarFromProtoIndex(t_lit)
+                    taught = model.NewBoolVar("")
+                    model.AddBoolOr([taught, lit.Not(), chosen.Not()])
+                    model.AddImplication(taught, lit)
+                    model.AddImplication(taught, chosen)
+                tasks["teacher", tid, day].append((start, hours, taught))
+        for rid, r_lit in r_lits.items():
+            # two_stage ไม่มีตัวแปรห้อง (rid = None) ห้องเดียว (True) ถูกใช้แน่นอน
+            if rid is not None:
+                room_usage[g, rid].append([model.NewConstant(1) if r_lit is True
+                                           else model.GetBoolVarFromProtoIndex(r_lit)])
+
+    gaps = []
+    for (_, _, day), day_tasks in tasks.items():
+        if len(day_tasks) < 2:
+            continue
+        day_slots = data["day_timeslots"][day]
+        first = model.NewIntVar(day_slots[0], day_slots[-1] + 1, "")
+        last = model.NewIntVar(day_slots[0], day_slots[-1] + 1, "")
+        for start, hours, lit in day_tasks:
+            model.Add(first <= start).OnlyEnforceIf(lit)
+            model.Add(last >= start + hours).OnlyEnforceIf(lit)
+        gap = model.NewIntVar(0, len(day_slots), "")
+        model.Add(gap >= last - first - sum(hours * lit for _, hours, lit in day_tasks))
+        gaps.append(gap)
+    return gaps, room_usage
+
+
+def add_quality_objective(built, data):
+    """ตั้ง objective ลดคาบว่างระหว่างวันของกลุ่มและครู และจำนวนห้องที่แต่ละกลุ่มใช้เกินห้องแรก คืนจำนวน term
+
+    ค่า objective = QUALITY_WEIGHTS["gap"] * คาบว่าง + QUALITY_WEIGHTS["room"] * ห้องที่ต้องย้ายไป (0 = ไม่มีเลย)
+    """
+    model = built["model"]
+    if built["engine"] == "boolean":
+        occupancy, room_usage = boolean_occupancy(model, built["layout"], data)
+        idle = [lit for by_slot in occupancy.values() for lit in idle_lits(model, data, by_slot)]
+    else:
+        idle, room_usage = interval_gaps(model, built["layout"], data)
+    rooms_used = []
+    by_group = defaultdict(list)
+    for (g, _), per_job in room_usage.items():
+        used = model.NewBoolVar("")
+        for lits in per_job:
+            model.Add(cp_model.LinearExpr.Sum(lits) <= used)
+        rooms_used.append(used)
+        by_group[g].append(used)
+    for used in by_group.values():
+        model.AddBoolOr(used)  # (ซ้ำซ้อน) ทุกกลุ่มใช้อย่างน้อยหนึ่งห้อง ทำให้ bound ไม่ติดลบ
+    groups_with_rooms = len(by_group)
+    model.Minimize(QUALITY_WEIGHTS["gap"] * cp_model.LinearExpr.Sum(idle)
+                   + QUALITY_WEIGHTS["room"] * (cp_model.LinearExpr.Sum(rooms_used) - groups_with_rooms))
+    return len(idle) + len(rooms_used)
+
+
+def quality_metrics(assignments, data):
+    """วัดคุณภาพตารางที่ได้: คาบว่างระหว่างวันของกลุ่ม/ครู จำนวนห้องที่กลุ่มต้องย้ายไปใช้ (ห้องที่เกินห้องแรก) และ score รวม"""
+    position = {t: (day, pos) for day, day_slots in data["day_timeslots"].items() for pos, t in enumerate(day_slots)}
+    used = defaultdict(set)
+    rooms = defaultdict(set)
+    for g, sid, tid, rid, i in assignments:
+        for t in data["covers"][i, subject_hours(data["subjects"][sid])]:
+            used["group", g].add(position[t])
+            used["teacher", tid].add(position[t])
+        rooms[g].add(rid)
+
+    metrics = {"group_gaps": 0, "teacher_gaps": 0, "room_changes": sum(len(r) - 1 for r in rooms.values())}
+    for (kind, _), slots in used.items():
+        by_day = defaultdict(list)
+        for day, pos in slots:
+            by_day[day].append(pos)
+        metrics[f"{kind}_gaps"] += sum(max(p) - min(p) + 1 - len(p) for p in by_day.values())
+    # ค่าเดียวกับ objective ของ add_quality_objective (ใช้เทียบข้าม engine ได้ เพราะ two_stage ไม่นับห้อง)
+    metrics["score"] = (QUALITY_WEIGHTS["gap"] * (metrics["group_gaps"] + metrics["teacher_gaps"])
+                        + QUALITY_WEIGHTS["room"] * metrics["room_changes"])
+    return metrics
+
+
+# ======================
+# MODEL CACHE
+# ======================
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".solver_cache")
+CACHE_MAX_BYTES = 512 * 1024 * 1024
+CACHE_VERSION = 8  # เพิ่มเมื่อรูปแบบโมเดลเปลี่ยน เพื่อไม่ให้ใช้ cache เก่า
+
+
+def fingerprint(data, engine, quality=False):
+    """hash ของข้อมูลนำเข้าทั้งหมด (กลุ่ม วิชา คาบ ลงทะเบียน ผู้สอน ห้อง คาบที่ไม่ว่าง) + engine และ objective"""
+    def canonical(value):
+        if isinstance(value, dict):
+            return {str(k): canonical(v) for k, v in value.items()}
+        if isinstance(value, (set, frozenset)):
+            return sorted(canonical(v) for v in value)
+        if isinstance(value, (list, tuple)):
+            return [canonical(v) for v in value]
+        return value
+
+    objective = QUALITY_WEIGHTS if quality else None
+    text = json.dumps([CACHE_VERSION, engine, objective, canonical(data)], sort_keys=True, default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def read_cache(name):
+    path = os.path.join(CACHE_DIR, name)
+    try:
+        with gzip.open(path, "rb") as f:
+            entry = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return None
+    try:
+        os.utime(path)  # ใช้ล่าสุด ไม่ถูกลบก่อน
+    except FileNotFoundError:
+        pass  # process อื่นลบไปแล้วระหว่างอ่าน
+    return entry
+
+
+def write_cache(name, entry):
+    """เขียนไฟล์แบบ atomic แล้วลบไฟล์ที่ใช้นานที่สุดจนขนาดรวมไม่เกิน CACHE_MAX_BYTES"""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = os.path.join(CACHE_DIR, name)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with gzip.open(tmp, "wb", compresslevel=1) as f:
+        pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+    # หลาย process (race / components) เขียนพร้อมกันได้: ไฟล์อาจถูกลบหรือแทนที่ระหว่างวนลูป
+    # ไม่แตะไฟล์ .tmp ที่ process อื่นกำลังเขียน
+    files = []
+    for entry_name in os.listdir(CACHE_DIR):
+        if entry_name.endswith(".tmp"):
+            continue
+        try:
+            stat = os.stat(os.path.join(CACHE_DIR, entry_name))
+        except FileNotFoundError:
+            continue
+        files.append((stat.st_mtime, stat.st_size, entry_name))
+    total = sum(size for _, size, _ in files)
+    for _, size, entry_name in sorted(files):
+        if total <= CACHE_MAX_BYTES or entry_name == name:
+            continue
+        try:
+            os.remove(os.path.join(CACHE_DIR, entry_name))
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+def store_model(key, built):
+    write_cache(f"{key}.model", {
+        "proto": str(built["model"].Proto()),
+        "layout": built["layout"],
+        "counts": built["counts"],
+        "skipped_subjects": built["skipped_subjects"],
+        "subjects_without_vars": built["subjects_without_vars"],
+        "symmetry": built.get("canonical") is not None,
+    })
+
+
+def load_cached_model(key, data, engine):
+    """สร้าง built กลับจาก cache (โมเดล + layout ของตัวแปร) คืน None ถ้าไม่มี"""
+    entry = read_cache(f"{key}.model")
+    if entry is None:
+        return None
+    model = cp_model.CpModel()
+    model.Proto().parse_text_format(entry["proto"])
+
+    handlers = boolean_handlers if engine == "boolean" else interval_handlers
+    built = {
+        "model": model,
+        "counts": entry["counts"],
+        "skipped_subjects": entry["skipped_subjects"],
+        "subjects_without_vars": entry["subjects_without_vars"],
+        "layout": entry["layout"],
+        "canonical": symmetry_canonical(data) if entry["symmetry"] else None,
+        "engine": engine,
+        "cached": True,
+        **handlers(model, entry["layout"]),
+    }
+    if engine == "two_stage":
+        built["finish"] = two_stage_finish(data)
+    return built
+
+
+def solution_key(built, max_time_in_seconds, num_workers, random_seed, relative_gap=0, parameters=None):
+    params = json.dumps([max_time_in_seconds, num_workers, random_seed, relative_gap, parameters], sort_keys=True)
+    return f"{built['fingerprint']}-{hashlib.sha256(params.encode()).hexdigest()[:16]}.solution"
+
+
+# ======================
+# WARM START
+# ======================
+def load_output_assignments(data):
+    """อ่านตาราง output ปัจจุบันกลับเป็น assignments (group, subject, teacher, room, start)"""
+    rows = db.fetch_all("SELECT group_id, timeslot_id, subject_id, teacher_id, room_id FROM output")
+    return output_assignments(rows, data)
+
+
+def output_assignments(rows, data):
+    """รวมแถวต่อคาบของ output เป็น block เดียวต่อ (group, subject) โดยใช้คาบแรกเป็นจุดเริ่ม
+
+    ตัด block ที่คาบไม่ต่อเนื่องครบตามจำนวนคาบปัจจุบันของวิชาทิ้ง (เช่น วิชาถูกแก้จำนวนคาบ หรือคาบถูกปิด)
+    วิชาเหล่านั้นจึงนับเป็นวิชาที่ต้องจัดใหม่
+    """
+    blocks = {}
+    slots = defaultdict(set)
+    for r in rows:
+        i = data["ts_index"].get(r["timeslot_id"])
+        key = (r["group_id"], r["subject_id"])
+        slots[key].add(i)
+        if i is None:
+            continue
+        if key not in blocks or i < blocks[key][4]:
+            blocks[key] = (r["group_id"], r["subject_id"], r["teacher_id"], r["room_id"], i)
+    return [a for key, a in blocks.items()
+            if a[1] in data["subjects"]
+            and slots[key] == set(range(a[4], a[4] + subject_hours(data["subjects"][a[1]])))]
+
+
+def add_hints(built, assignments):
+    """ใส่คำตอบเดิมเป็น hint ของโมเดล คืนจำนวน (group, subject) ที่ใส่ hint ได้
+
+    โมเดลที่ตัด symmetry สลับกลุ่ม/ห้องใน hint ให้ผ่าน cut ก่อน ไม่อย่างนั้น hint ชี้ไปที่คำตอบที่ถูกตัดทิ้ง
+    """
+    if built.get("canonical"):
+        assignments = built["canonical"](assignments)
+    built["hints"] = assignments
+    return built["hint"](assignments)
+
+
+# ======================
+# DELTA
+# ======================
+def class_is_valid(data, assignment):
+    """assignment เดิมยังใช้ได้กับข้อมูลปัจจุบันหรือไม่ (ยังลงทะเบียน ครู/ห้อง/คาบ ยังถูกต้อง)"""
+    g, sid, tid, rid, i = assignment
+    if sid not in data["group_subjects"].get(g, []):
+        return False
+    hours = subject_hours(data["subjects"][sid])
+    return (tid in (data["subject_teachers"].get(sid, []) or ["T00"])
+            and rid in rooms_for(data, g, sid)
+            and i in valid_starts(data, hours)
+            and all(is_free(data, kind, res, i, hours) for kind, res in (("group", g), ("teacher", tid), ("room", rid))))
+
+
+def valid_assignments(data, previous):
+    """{(group, subject): assignment} ของ assignment เดิมที่ยังใช้ได้ (class_is_valid) และไม่ชนกันเอง
+
+    assignment ที่ใช้กลุ่ม ครู หรือห้องคาบเดียวกันกับอีกวิชา (เช่น หลังเพิ่มจำนวนคาบของวิชา) ถูกตัดทั้งคู่
+    กลุ่มของวิชาเหล่านั้นจึงถูกจัดใหม่แทนการตรึงตารางที่ชนกัน
+    """
+    current = {(a[0], a[1]): a for a in previous if class_is_valid(data, a)}
+    owners = defaultdict(set)
+    for key, (g, sid, tid, rid, i) in current.items():
+        for t in range(i, i + subject_hours(data["subjects"][sid])):
+            for res in (("group", g), ("teacher", tid), ("room", rid)):
+                owners[res, t].add(key)
+    clashes = {key for keys in owners.values() if len(keys) > 1 for key in keys}
+    return {key: a for key, a in current.items() if key not in clashes}
+
+
+def delta_data(data, previous, depth=1):
+    """หาเฉพาะวิชาที่ได้รับผลจากการแก้ข้อมูล ส่วนที่เหลือตรึงตาม output เดิม
+
+    เริ่มจากทุกวิชาของกลุ่มที่มีวิชาใหม่/วิชาที่ assignment เดิมใช้ไม่ได้ แล้วขยายไปวิชาที่ใช้ครู
+    หรือห้องเดียวกันกับวิชาที่ปล่อยแล้ว depth ชั้น
+    คืน (sub_data, pinned, freed) โดย sub_data มีเฉพาะวิชาที่ต้องจัดใหม่ และคาบของ pinned ถูกนับเป็นคาบไม่ว่าง
+    """
+    current = valid_assignments(data, previous)
+    seeds = {g for g in data["groups"] for sid in data["group_subjects"].get(g, []) if (g, sid) not in current}
+    freed = {(g, sid) for g in seeds for sid in data["group_subjects"].get(g, [])}
+
+    # กราฟวิชา - ครู/ห้อง (วิชาที่ตรึงได้ใช้ครู/ห้องตาม output เดิม)
+    resource_classes = defaultdict(set)
+    for key, (g, sid, tid, rid, i) in current.items():
+        resource_classes["teacher", tid].add(key)
+        resource_classes["room", rid].add(key)
+
+    def resources(key):
+        if key in current:
+            return {("teacher", current[key][2]), ("room", current[key][3])}
+        return {("teacher", tid) for tid in data["subject_teachers"].get(key[1], []) or ["T00"]}
+
+    frontier = set(freed)
+    for _ in range(depth):
+        frontier = {other for key in frontier for res in resources(key) for other in resource_classes[res]} - freed
+        freed |= frontier
+
+    pinned = [a for key, a in current.items() if key not in freed]
+    return pinned_data(data, pinned, freed), pinned, freed
+
+
+def pinned_data(data, pinned, freed):
+    """data ที่มีเฉพาะวิชาใน freed โดยคาบของวิชาที่ตรึงไว้ (pinned) นับเป็นคาบไม่ว่างของกลุ่ม ครู และห้อง"""
+    busy = {kind: defaultdict(set, {res: set(slots) for res, slots in by_res.items()})
+            for kind, by_res in data["busy"].items()}
+    for g, sid, tid, rid, i in pinned:
+        slots = range(i, i + subject_hours(data["subjects"][sid]))
+        busy["group"][g].update(slots)
+        busy["teacher"][tid].update(slots)
+        busy["room"][rid].update(slots)
+
+    group_subjects = defaultdict(list)
+    for g, sid in freed:
+        group_subjects[g].append(sid)
+
+    sub_data = dict(data)
+    sub_data["groups"] = [g for g in data["groups"] if g in group_subjects]
+    sub_data["group_subjects"] = group_subjects
+    sub_data["busy"] = busy
+    return sub_data
+
+
+# ======================
+# REPAIR
+# ======================
+REPAIR_RINGS = ("class", "group", "teacher", "room", "all")
+
+
+def without_resources(data, lost):
+    """สำเนา data ที่ครู/ห้องใน lost = [("teacher"|"room", id)] ไม่ว่างทุกคาบ (ครูลา ห้องปิด)"""
+    busy = {kind: defaultdict(set, by_res) for kind, by_res in data["busy"].items()}
+    for kind, res in lost:
+        busy[kind][res] = set(range(len(data["timeslots"])))
+    return dict(data, busy=busy)
+
+
+def repair_ring(data, current, freed, ring):
+    """ขยายชุดวิชาที่ปล่อยให้ครอบวิชาที่ใช้ group/teacher/room เดียวกันกับวิชาที่ปล่อยแล้ว ("all" = ทุกวิชา)"""
+    if ring == "all":
+        return {(g, sid) for g in data["groups"] for sid in data["group_subjects"].get(g, [])}
+    if ring == "class":
+        return set(freed)
+    position = {"group": 0, "teacher": 2, "room": 3}[ring]
+    used = {current[key][position] for key in freed if key in current}
+    if ring == "group":
+        used |= {g for g, _ in freed}
+    elif ring == "teacher":
+        used |= {tid for key in freed if key not in current for tid in data["subject_teachers"].get(key[1], [])}
+    return set(freed) | {key for key, a in current.items() if a[position] in used}
+
+
+def repair(data, previous, max_time_in_seconds=60, num_workers=0, random_seed=0, on_round=None):
+    """ซ่อมตารางเดิมหลังข้อมูลเปลี่ยน (เช่น without_resources()) โดยย้ายวิชาให้น้อยที่สุด (large neighborhood search)
+
+    เริ่มจากปล่อยเฉพาะวิชาที่ assignment เดิมใช้ไม่ได้แล้ว ที่เหลือตรึงไว้ ถ้าแก้ไม่ได้ขยายวงตาม REPAIR_RINGS
+    (วิชาอื่นของกลุ่มเดียวกัน -> ครูเดียวกัน -> ห้องเดียวกัน -> ทั้งตาราง) ในแต่ละวงให้ CP-SAT หาคำตอบที่มีวิชาอยู่ที่เดิมมากที่สุด
+    คืนผลแบบ solve() ของวงแรกที่แก้ได้ พร้อม "pinned", "moved" [(group, subject)], "broken" และ "ring"
+    on_round(info) ถูกเรียกหลังแต่ละวง
+    """
+    started = time.time()
+    current = valid_assignments(data, previous)
+    broken = {(g, sid) for g in data["groups"] for sid in data["group_subjects"].get(g, [])
+              if (g, sid) not in current}
+    freed = set(broken)
+    status = cp_model.UNKNOWN
+    for k, ring in enumerate(REPAIR_RINGS):
+        wider = repair_ring(data, current, freed, ring)
+        if k and wider == freed:
+            continue  # วงนี้ไม่ได้ปล่อยวิชาเพิ่ม ผลเหมือนวงก่อน
+        freed = wider
+        remaining = max_time_in_seconds - (time.time() - started)
+        if remaining <= 0:
+            break
+
+        pinned = [a for key, a in current.items() if key not in freed]
+        sub_data = pinned_data(data, pinned, freed)
+        built = build_interval_model(sub_data, symmetry=False)
+        if built["subjects_without_vars"]:
+            # มีวิชาที่ไม่เหลือคาบ/ครู/ห้องให้ลงเลยเมื่อตรึงส่วนที่เหลือ ต้องขยายวง
+            result = {"status": cp_model.INFEASIBLE, "status_name": "INFEASIBLE", "assignments": None}
+        else:
+            kept = built["keep"](list(current.values()))
+            if kept:
+                built["model"].Maximize(sum(kept.values()))
+            add_hints(built, list(current.values()))
+            result = solve(built, sub_data, remaining, num_workers, random_seed)
+        status = result["status"]
+        solved = result["assignments"] is not None and not result.get("unplaced")
+        if on_round:
+            on_round({"ring": ring, "freed": len(freed), "status_name": result["status_name"],
+                      "wall_time": time.time() - started, "solved": solved})
+        if solved:
+            moved = [(a[0], a[1]) for a in result["assignments"] if current.get((a[0], a[1])) != a]
+            return dict(result, pinned=pinned, moved=moved, broken=sorted(broken), ring=ring,
+                        wall_time=time.time() - started)
+
+    return {"status": status, "status_name": cp_model.CpSolver().StatusName(status),
+            "wall_time": time.time() - started, "assignments": None, "pinned": [], "moved": [],
+            "broken": sorted(broken), "ring": None}
+
+
+# ======================
+# ROOM MATCHING
+# ======================
+def match(candidates):
+    """bipartite matching (augmenting path) คืน {left: right} หรือ None ถ้าจับคู่ไม่ครบ"""
+    owner = {}  # right -> left
+
+    def augment(left, seen):
+        for right in candidates[left]:
+            if right in seen:
+                continue
+            seen.add(right)
+            if right not in owner or augment(owner[right], seen):
+                owner[right] = left
+                return True
+        return False
+
+    for left in candidates:
+        if not augment(left, set()):
+            return None
+    return {left: right for right, left in owner.items()}
+
+
+def assign_rooms(assignments, data):
+    """เลือกห้องให้แต่ละ block ทีละคาบเริ่ม ห้องว่างต้องว่างจนจบ block เดิม คืน None ถ้าจับคู่ไม่ได้"""
+    busy_until = {rid: 0 for rid in data["rooms"]}
+    by_start = defaultdict(list)
+    for a in assignments:
+        by_start[a[4]].append(a)
+
+    # ห้องที่มีวิชาใช้ได้น้อยกว่าถูกลองก่อน เก็บห้องเฉพาะทางไว้ให้วิชาที่ต้องใช้
+    demand = defaultdict(int)
+    for a in assignments:
+        for rid in rooms_for(data, a[0], a[1]):
+            demand[rid] += 1
+
+    result = []
+    for i in sorted(by_start):
+        candidates = {a: sorted((rid for rid in rooms_for(data, a[0], a[1])
+                                 if busy_until[rid] <= i
+                                 and is_free(data, "room", rid, i, subject_hours(data["subjects"][a[1]]))),
+                                key=lambda rid: demand[rid])
+                      for a in by_start[i]}
+        matched = match(candidates)
+        if matched is None:
+            return None
+        for (g, sid, tid, _, start), rid in matched.items():
+            busy_until[rid] = start + subject_hours(data["subjects"][sid])
+            result.append((g, sid, tid, rid, start))
+    return result
+
+
+def assign_rooms_exact(assignments, data, max_time_in_seconds=30):
+    """เลือกห้องด้วย CP-SAT โดยตรึงเวลาไว้ (ใช้เมื่อจับคู่ทีละคาบไม่สำเร็จ) คืน None ถ้าไม่มีคำตอบ"""
+    model = cp_model.CpModel()
+    y = {}
+    by_room = defaultdict(list)
+    for a in assignments:
+        g, sid, tid, _, i = a
+        hours = subject_hours(data["subjects"][sid])
+        rooms = [rid for rid in rooms_for(data, g, sid) if is_free(data, "room", rid, i, hours)]
+        for rid in rooms:
+            y[a, rid] = model.NewBoolVar("")
+            for t in data["covers"][i, hours]:
+                by_room[rid, t].append(y[a, rid])
+        model.AddExactlyOne(y[a, rid] for rid in rooms)
+    for lits in by_room.values():
+        if len(lits) > 1:
+            model.AddAtMostOne(lits)
+
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = max_time_in_seconds
+    if solver.Solve(model) not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        return None
+    return [(a[0], a[1], a[2], rid, a[4]) for (a, rid), lit in y.items() if solver.Value(lit)]
+
+
+# ======================
+# GREEDY DRAFT
+# ======================
+def greedy_schedule(data, fixed=None):
+    """จัดตารางร่างแบบ greedy (DSATUR) โดยไม่ใช้ solver คืน (assignments, unplaced)
+
+    วิชาใน fixed (เช่น output เดิม) ที่ยังใช้ได้และไม่ชนกันถูกลงก่อน ที่เหลือเลือกวิชาที่มีคาบเริ่มลงได้น้อยที่สุดก่อน
+    (เสมอกันเลือก block ยาว ครูภาระมาก และห้องที่ใช้ได้น้อยก่อน) แล้วลงคาบที่กลุ่มเรียนวันนั้นน้อยที่สุด
+    unplaced = [(group, subject)] ที่ลงไม่ได้
+    """
+    jobs, _ = schedulable_subjects(data)
+    # คาบไม่ว่างเก็บเป็น bitmask ต่อ resource ตรวจ block ว่างด้วย busy & mask[start, hours] == 0
+    mask = {key: sum(1 << t for t in block) for key, block in data["covers"].items()}
+    busy = {kind: defaultdict(int, {res: sum(1 << t for t in slots) for res, slots in by_res.items()})
+            for kind, by_res in data["busy"].items()}
+    group_day_hours = defaultdict(int)
+    day_of = {i: t["day"] for i, t in enumerate(data["timeslots"])}
+    assignments = []
+
+    def place(j, tid, rid, i):
+        g, sid, hours = jobs[j][:3]
+        for kind, res in (("group", g), ("teacher", tid), ("room", rid)):
+            busy[kind][res] |= mask[i, hours]
+        group_day_hours[g, day_of[i]] += hours
+        assignments.append((g, sid, tid, rid, i))
+
+    def options(j):
+        """[(start, ครูที่ว่าง, ห้องที่ว่าง)] ของวิชา j ตามคาบที่ไม่ว่างตอนนี้"""
+        g, _, hours, teachers, rooms = jobs[j]
+        result = []
+        for i in valid_starts(data, hours):
+            m = mask[i, hours]
+            if busy["group"][g] & m:
+                continue
+            free_teachers = [tid for tid in teachers if not busy["teacher"][tid] & m]
+            free_rooms = [rid for rid in rooms if not busy["room"][rid] & m] if free_teachers else []
+            if free_rooms:
+                result.append((i, free_teachers, free_rooms))
+        return result
+
+    # full[rooms] = คาบที่ห้องทุกห้องในชุดไม่ว่าง (ใช้ประมาณ saturation โดยไม่ต้องวนทีละห้อง)
+    room_sets = {tuple(rooms) for *_, rooms in jobs}
+    sets_of_room = defaultdict(list)
+    for rooms in room_sets:
+        for rid in rooms:
+            sets_of_room[rid].append(rooms)
+
+    def all_busy(rooms):
+        full = -1 if rooms else 0
+        for rid in rooms:
+            full &= busy["room"][rid]
+        return full
+
+    full = {rooms: all_busy(rooms) for rooms in room_sets}
+
+    def count_options(j):
+        """จำนวนคาบเริ่มที่วิชา j ยังลงได้โดยประมาณ (ห้องนับว่าว่างถ้าทุกคาบของ block มีห้องในชุดว่าง)"""
+        g, _, hours, teachers, rooms = jobs[j]
+        if not rooms:
+            return 0
+        blocked = busy["group"][g] | full[tuple(rooms)]
+        teacher_busy = [busy["teacher"][tid] for tid in teachers]
+        if len(teacher_busy) == 1:
+            blocked |= teacher_busy[0]
+            teacher_busy = []
+        count = 0
+        for i in valid_starts(data, hours):
+            m = mask[i, hours]
+            if not blocked & m and (not teacher_busy or any(not b & m for b in teacher_busy)):
+                count += 1
+        return count
+
+    remaining = set(range(len(jobs)))
+    job_of = {(g, sid): j for j, (g, sid, *_) in enumerate(jobs)}
+    for g, sid, tid, rid, i in fixed or []:
+        j = job_of.get((g, sid))
+        if j in remaining and any(i == start and tid in teachers and rid in rooms
+                                  for start, teachers, rooms in options(j)):
+            place(j, tid, rid, i)
+            remaining.discard(j)
+
+    teacher_load = defaultdict(int)
+    room_demand = defaultdict(int)
+    by_resource = defaultdict(set)
+    for j in remaining:
+        g, _, hours, teachers, rooms = jobs[j]
+        by_resource["group", g].add(j)
+        for tid in teachers:
+            teacher_load[tid] += hours / len(teachers)
+            by_resource["teacher", tid].add(j)
+        for rid in rooms:
+            room_demand[rid] += 1
+
+    tie_break = {j: (-jobs[j][2], -max(teacher_load[tid] for tid in jobs[j][3]), len(jobs[j][4])) for j in remaining}
+
+    # saturation = จำนวนคาบเริ่มที่ยังลงได้ คำนวณใหม่เฉพาะวิชาที่ใช้กลุ่ม/ครูเดียวกับวิชาที่เพิ่งลง
+    saturation = {j: count_options(j) for j in remaining}
+    unplaced = []
+    while remaining:
+        j = min(remaining, key=lambda j: (saturation[j], tie_break[j]))
+        remaining.discard(j)
+        g, sid, hours, teachers, rooms = jobs[j]
+        for key in [("group", g)] + [("teacher", t) for t in teachers]:
+            by_resource[key].discard(j)
+        for rid in rooms:
+            room_demand[rid] -= 1
+        candidates = options(j)
+        if not candidates:
+            unplaced.append((g, sid))
+            continue
+        i, free_teachers, free_rooms = min(candidates, key=lambda c: (group_day_hours[g, day_of[c[0]]], c[0]))
+        tid = min(free_teachers, key=lambda t: bin(busy["teacher"][t]).count("1"))
+        rid = min(free_rooms, key=lambda r: room_demand[r])
+        place(j, tid, rid, i)
+        for room_set in sets_of_room[rid]:
+            full[room_set] = all_busy(room_set)
+        for other in by_resource["group", g] | by_resource["teacher", tid]:
+            saturation[other] = count_options(other)
+    return assignments, unplaced
+
+
+def solve_greedy(data, fixed=None):
+    """จัดตารางร่างด้วย greedy_schedule() อย่างเดียว (ไม่ใช้ CP-SAT) คืน dict แบบเดียวกับ solve()"""
+    started = time.time()
+    assignments, unplaced = greedy_schedule(data, fixed)
+    status = cp_model.UNKNOWN if unplaced else cp_model.FEASIBLE
+    return {
+        "status": status,
+        "status_name": cp_model.CpSolver().StatusName(status),
+        "wall_time": time.time() - started,
+        "assignments": assignments,
+        "unplaced": unplaced,
+        "draft": True,
+    }
+
+
+# ======================
+# SOLVE
+# ======================
+class ProgressCallback(cp_model.CpSolverSolutionCallback):
+    """ส่งจำนวนคำตอบ ค่า objective ขอบล่าง และเวลาที่ใช้ ให้ on_solution ทุกครั้งที่เจอคำตอบใหม่
+
+    ถ้า on_solution คืนค่า True จะหยุดค้นหาทันที (ใช้คำตอบล่าสุด)
+    """
+
+    def __init__(self, on_solution, has_objective):
+        super().__init__()
+        self.on_solution = on_solution
+        self.has_objective = has_objective
+        self.solutions = 0
+        self.stopped = False
+
+    def on_solution_callback(self):
+        self.solutions += 1
+        stop = self.on_solution({
+            "solutions": self.solutions,
+            "objective": self.ObjectiveValue() if self.has_objective else None,
+            "bound": self.BestObjectiveBound() if self.has_objective else None,
+            "wall_time": self.WallTime(),
+        })
+        if stop:
+            self.stopped = True
+            self.StopSearch()
+
+
+def relative_gap_of(objective, bound):
+    """ช่องว่างสัมพัทธ์ระหว่างคำตอบกับขอบล่าง (0 = พิสูจน์แล้วว่าดีที่สุด)"""
+    return abs(objective - bound) / max(abs(objective), 1)
+
+
+def solve(built, data, max_time_in_seconds=300, num_workers=0, random_seed=0, on_solution=None, relative_gap=0,
+          parameters=None):
+    """แก้โมเดล คืน dict ของสถานะ เวลา และ assignments (group, subject, teacher, room, start)
+
+    num_workers=0 ให้ CP-SAT เลือกจำนวน thread เอง
+    parameters = {ชื่อ: ค่า} ของ CpSolver.parameters เพิ่มเติม (เช่น search_branching, linearization_level)
+    โมเดลที่มี objective: หยุดเมื่อ (objective - bound) / objective <= relative_gap หรือหมดเวลา
+    แล้วคืน "objective", "bound", "gap" ด้วย
+    ถ้าหมดเวลาโดยไม่พบคำตอบ คืนตารางร่างจาก greedy_schedule() พร้อม "draft" และ "unplaced"
+    ถ้าโมเดลมาจาก build_model(cache=True) และเคยแก้ด้วยพารามิเตอร์เดียวกันแล้ว คืนคำตอบจาก cache ทันที
+    """
+    cache_name = None
+    if built.get("fingerprint"):
+        cache_name = solution_key(built, max_time_in_seconds, num_workers, random_seed, relative_gap, parameters)
+        cached = read_cache(cache_name)
+        if cached is not None:
+            return {**cached, "cached": True}
+
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = max_time_in_seconds
+    solver.parameters.num_workers = num_workers
+    solver.parameters.random_seed = random_seed
+    solver.parameters.relative_gap_limit = relative_gap
+    if built.get("hints"):
+        # presolve ตัดคำตอบที่สมมาตรกันทิ้งได้ (รวมคำตอบใน hint) ทำให้ hint ที่ใช้ได้กลายเป็น infeasible
+        solver.parameters.keep_all_feasible_solutions_in_presolve = True
+    for name, value in (parameters or {}).items():
+        setattr(solver.parameters, name, value)
+    callback = None
+    if on_solution:
+        callback = ProgressCallback(on_solution, built["model"].HasObjective())
+    status = solver.Solve(built["model"], callback)
+
+    result = {
+        "status": status,
+        "status_name": solver.StatusName(status),
+        "wall_time": solver.WallTime(),
+        "assignments": None,
+    }
+    if callback and callback.stopped:
+        result["stopped"] = True  # หยุดก่อนหมดเวลาตาม on_solution (เช่น stop-at-first)
+    if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        result["assignments"] = built["decode"](list(solver.ResponseProto().solution))
+        if built["model"].HasObjective():
+            result["objective"] = solver.ObjectiveValue()
+            result["bound"] = solver.BestObjectiveBound()
+            result["gap"] = relative_gap_of(result["objective"], result["bound"])
+        if "finish" in built:
+            result["assignments"] = built["finish"](result["assignments"])
+            if result["assignments"] is None:
+                # จับคู่ห้องไม่ได้ แก้ใหม่ทั้งโมเดลพร้อมห้อง
+                joint = build_model(data, "interval", quality=built["model"].HasObjective())
+                if built.get("hints"):
+                    add_hints(joint, built["hints"])
+                fallback = solve(joint, data,
+                                 max(max_time_in_seconds - solver.WallTime(), 1),
+                                 num_workers, random_seed, on_solution, relative_gap, parameters)
+                fallback["wall_time"] += solver.WallTime()
+                fallback["fallback"] = True
+                result = fallback
+    # เก็บเฉพาะผลที่ชัดเจน (มีคำตอบ หรือพิสูจน์แล้วว่าไม่มี) ผลที่หมดเวลาต้องแก้ใหม่
+    # ผลที่ on_solution สั่งหยุดก่อนไม่เก็บ: ไม่อยู่ใน key และอาจแย่กว่ารอบที่ให้ solver ทำจนครบเวลา
+    if cache_name and not result.get("stopped") and (
+            result["assignments"] is not None or result["status"] == cp_model.INFEASIBLE):
+        write_cache(cache_name, result)
+    if result["assignments"] is None and result["status"] != cp_model.INFEASIBLE:
+        # หมดเวลาโดยยังไม่พบคำตอบ ใช้ตารางร่างจาก greedy แทน (อาจลงไม่ครบทุกวิชา)
+        result["assignments"], result["unplaced"] = greedy_schedule(data, built.get("hints"))
+        result["draft"] = True
+    return result
+
+
+# ======================
+# COMPONENTS
+# ======================
+def components(data):
+    """แบ่งกลุ่มเป็นส่วนที่ไม่ใช้ครูหรือห้องร่วมกันเลย (connected components ของกราฟ group-teacher-room)
+
+    คืน [[group, ...]] เรียงจากส่วนที่มีวิชามากที่สุด
+    """
+    parent = {}
+
+    def find(node):
+        parent.setdefault(node, node)
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    jobs, _ = schedulable_subjects(data)
+    size = defaultdict(int)
+    for g, sid, hours, teachers, rooms in jobs:
+        size[g] += 1
+        for res in [("teacher", tid) for tid in teachers] + [("room", rid) for rid in rooms]:
+            parent[find(res)] = find(("group", g))
+
+    parts = defaultdict(list)
+    for g in data["groups"]:
+        if size[g]:  # กลุ่มที่ไม่มีวิชาให้จัดไม่ต้องแก้
+            parts[find(("group", g))].append(g)
+    return sorted(parts.values(), key=lambda groups: -sum(size[g] for g in groups))
+
+
+def component_data(data, groups):
+    """ข้อมูลเฉพาะกลุ่มในส่วนนี้ (ห้องเหลือเฉพาะที่วิชาในส่วนนี้ใช้ได้)"""
+    group_subjects = {g: data["group_subjects"].get(g, []) for g in groups}
+    used = {rid for g, subjects in group_subjects.items() for sid in subjects for rid in rooms_for(data, g, sid)}
+    return dict(data, groups=list(groups), group_subjects=group_subjects,
+                rooms=[rid for rid in data["rooms"] if rid in used])
+
+
+def solve_component(data, engine, hints, max_time_in_seconds, num_workers, random_seed, cache, quality, relative_gap):
+    """สร้างและแก้โมเดลของส่วนเดียว (รันใน process แยก)"""
+    built = build_model(data, engine, cache=cache, quality=quality)
+    if hints:
+        add_hints(built, hints)
+    return solve(built, data, max_time_in_seconds, num_workers, random_seed, relative_gap=relative_gap)
+
+
+def solve_components(data, parts, engine="boolean", max_time_in_seconds=300, num_workers=0, random_seed=0,
+                     hints=None, cache=False, on_component=None, quality=False, relative_gap=0):
+    """แก้แต่ละส่วนใน process pool พร้อมกันแล้วรวมคำตอบ คืน dict แบบเดียวกับ solve() + "components"
+
+    num_workers คือจำนวน thread รวม แบ่งให้ process ละเท่า ๆ กัน (0 = ทุก core)
+    on_component(info) ถูกเรียกเมื่อแต่ละส่วนเสร็จ
+    """
+    total_workers = num_workers or os.cpu_count() or 1
+    processes = max(1, min(len(parts), total_workers))
+    per_process = max(1, total_workers // processes)
+    started = time.time()
+
+    results = [None] * len(parts)
+    # spawn: ไม่ fork process ที่มี thread ของ Streamlit/solver อยู่
+    with ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = {}
+        for k, groups in enumerate(parts):
+            part_data = component_data(data, groups)
+            members = set(groups)
+            part_hints = [a for a in hints or [] if a[0] in members]
+            futures[pool.submit(solve_component, part_data, engine, part_hints, max_time_in_seconds,
+                                per_process, random_seed, cache, quality, relative_gap)] = k
+        for done, future in enumerate(as_completed(futures), 1):
+            k = futures[future]
+            results[k] = future.result()
+            if on_component:
+                on_component({"done": done, "total": len(parts), "groups": len(parts[k]),
+                              "status_name": results[k]["status_name"], "wall_time": results[k]["wall_time"]})
+
+    statuses = [r["status"] for r in results]
+    if cp_model.INFEASIBLE in statuses:
+        status = cp_model.INFEASIBLE
+    elif any(r.get("draft") for r in results):
+        status = cp_model.UNKNOWN
+    elif all(st == cp_model.OPTIMAL for st in statuses):
+        status = cp_model.OPTIMAL
+    else:
+        status = cp_model.FEASIBLE
+    merged = {
+        "status": status,
+        "status_name": cp_model.CpSolver().StatusName(status),
+        "wall_time": time.time() - started,
+        "assignments": None,
+        "components": [(len(groups), r["status_name"], r["wall_time"]) for groups, r in zip(parts, results)],
+    }
+    if status != cp_model.INFEASIBLE:
+        # ส่วนที่หมดเวลาได้ตารางร่างจาก solve() แล้ว รวมเป็นตารางร่างทั้งชุด
+        merged["assignments"] = [a for r in results for a in r["assignments"]]
+        if status == cp_model.UNKNOWN:
+            merged["draft"] = True
+            merged["unplaced"] = [key for r in results for key in r.get("unplaced", [])]
+        elif quality:
+            # objective แยกกันตามส่วน ผลรวมของ objective/bound คือของทั้งตาราง
+            merged["objective"] = sum(r["objective"] for r in results)
+            merged["bound"] = sum(r["bound"] for r in results)
+            merged["gap"] = relative_gap_of(merged["objective"], merged["bound"])
+    return merged
+
+
+# ======================
+# RACE
+# ======================
+# ชุดตั้งค่าที่แข่งกันโดยปริยาย: ต่างโมเดล ต่าง seed และต่างกลยุทธ์ค้นหา
+RACE_CONFIGS = [
+    {"engine": "boolean"},
+    {"engine": "interval"},
+    {"engine": "two_stage"},
+    {"engine": "interval", "seed": 1, "parameters": {"linearization_level": 2}},
+    {"engine": "boolean", "seed": 1,
+     "parameters": {"search_branching": cp_model.PORTFOLIO_WITH_QUICK_RESTART_SEARCH}},
+]
+
+
+def race_label(config):
+    """ชื่อสั้นของชุดตั้งค่า เช่น interval seed=1 linearization_level=2"""
+    parts = [config["engine"]]
+    if config.get("seed"):
+        parts.append(f"seed={config['seed']}")
+    parts += [f"{name}={getattr(value, 'name', value)}" for name, value in config.get("parameters", {}).items()]
+    return " ".join(parts)
+
+
+def race_entry(queue, k, data, config, hints, max_time_in_seconds, num_workers, random_seed, cache, quality,
+               relative_gap):
+    """สร้างและแก้โมเดลตามชุดตั้งค่าหนึ่งชุด แล้วส่ง (k, result) กลับทาง queue (รันใน process แยก)"""
+    try:
+        built = build_model(data, config["engine"], cache=cache, quality=quality)
+        if hints:
+            add_hints(built, hints)
+        result = solve(built, data, max_time_in_seconds, num_workers, random_seed + config.get("seed", 0),
+                       relative_gap=relative_gap, parameters=config.get("parameters"))
+    except Exception as e:
+        result = {"status": cp_model.MODEL_INVALID, "status_name": "ERROR", "wall_time": 0, "assignments": None,
+                  "error": repr(e)}
+    queue.put((k, result))
+
+
+def race(data, configs=None, max_time_in_seconds=300, num_workers=0, random_seed=0, hints=None, cache=False,
+         quality=False, relative_gap=0, on_finish=None):
+    """แข่งหลายชุดตั้งค่า (RACE_CONFIGS) พร้อมกันคนละ process คืน dict แบบเดียวกับ solve() + "winner", "race"
+
+    ไม่มี objective: ชุดแรกที่ได้ตาราง (หรือพิสูจน์ว่าไม่มี) ชนะ ที่เหลือถูกยกเลิก
+    มี objective (quality=True): รอจนทุกชุดหมดเวลาแล้วเลือก quality_metrics()["score"] ต่ำสุด
+    หยุดก่อนถ้ามีชุดที่ OPTIMAL (หรือถึง relative_gap) สำหรับทั้งตาราง
+    ตารางร่างจาก greedy (ชุดที่หมดเวลา) ใช้เมื่อไม่มีชุดไหนได้ตารางจริงเท่านั้น
+    on_finish(info) ถูกเรียกเมื่อแต่ละชุดเสร็จ
+    """
+    configs = configs or RACE_CONFIGS
+    total_workers = num_workers or os.cpu_count() or 1
+    per_process = max(1, total_workers // len(configs))
+    started = time.time()
+
+    # spawn: ไม่ fork process ที่มี thread ของ Streamlit/solver อยู่, Process แทน pool เพราะต้อง terminate ได้
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    processes = [context.Process(target=race_entry, daemon=True,
+                                 args=(queue, k, data, config, hints, max_time_in_seconds, per_process, random_seed,
+                                       cache, quality, relative_gap))
+                 for k, config in enumerate(configs)]
+    for process in processes:
+        process.start()
+
+    results = {}
+    try:
+        while len(results) < len(configs):
+            try:
+                k, result = queue.get(timeout=1)
+            except Empty:
+                # process ที่ตายโดยไม่ส่งผล (เช่น หน่วยความจำไม่พอ) นับว่าล้มเหลว
+                for j, process in enumerate(processes):
+                    if j not in results and not process.is_alive() and process.exitcode != 0:
+                        results[j] = {"status": cp_model.UNKNOWN, "status_name": f"EXIT {process.exitcode}",
+                                      "wall_time": time.time() - started, "assignments": None}
+                continue
+            if quality and result["assignments"] is not None:
+                result["score"] = quality_metrics(result["assignments"], data)["score"]
+            results[k] = result
+            if on_finish:
+                on_finish({"label": race_label(configs[k]), "status_name": result["status_name"],
+                           "wall_time": time.time() - started, "objective": result.get("objective"),
+                           "done": len(results), "total": len(configs)})
+            solved = result["assignments"] is not None and not result.get("draft")
+            if quality:
+                # OPTIMAL ของ two_stage ไม่นับห้อง จึงหยุดเฉพาะเมื่อ objective ครอบคลุมทั้งตาราง
+                solved = solved and (result["score"] == 0 or (result["status"] == cp_model.OPTIMAL
+                                                              and result.get("objective") == result["score"]))
+            if result["status"] == cp_model.INFEASIBLE or solved:
+                break
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+            process.join()
+
+    def rank(k):
+        result = results[k]
+        if result["status"] == cp_model.INFEASIBLE:
+            return (0, 0)
+        if result["assignments"] is not None and not result.get("draft"):
+            return (1, result.get("score", 0))
+        if result["assignments"] is not None:
+            return (2, len(result.get("unplaced", [])))
+        return (3, 0)
+
+    winner = min(results, key=rank)  # เสมอกันใช้ชุดที่เสร็จก่อน (dict เรียงตามลำดับที่เสร็จ)
+    merged = dict(results[winner])
+    merged["wall_time"] = time.time() - started
+    merged["winner"] = race_label(configs[winner])
+    merged["race"] = [(race_label(config), results[k]["status_name"] if k in results else "CANCELLED",
+                       results[k]["wall_time"] if k in results else None)
+                      for k, config in enumerate(configs)]
+    return merged
+
+
+# ======================
+# SCENARIOS
+# ======================
+SCENARIO_KEYS = {"name", "add_rooms", "remove_rooms", "add_teach", "remove_teachers", "blocked_slots",
+                 "subjects", "add_register", "remove_register", "group_sizes", "teacher_unavailable"}
+
+
+def apply_scenario(inputs, scenario):
+    """สร้างสำเนา inputs ที่แก้ตาม scenario (ไม่แตะฐานข้อมูล)
+
+    scenario = {"name": ..., "add_rooms": [{room_id, room_type, capacity}], "remove_rooms": [room_id],
+    "add_teach": [[subject_id, teacher_id]], "remove_teachers": [teacher_id],
+    "blocked_slots": [{day, period, group_id, room_id, label}] (แทนทั้งชุด),
+    "subjects": {subject_id: {theory/practice/room_type: ค่าใหม่}}, "add_register"/"remove_register": [[group_id, subject_id]],
+    "group_sizes": {group_id: student_count}, "teacher_unavailable": {teacher_id: [[day, period|null]]} (แทนของเดิมของครูคนนั้น)}
+    """
+    unknown = set(scenario) - SCENARIO_KEYS
+    if unknown:
+        raise ValueError(f"unknown scenario keys: {sorted(unknown)}")
+
+    removed_rooms = set(scenario.get("remove_rooms", []))
+    rooms = [r for r in inputs["rooms"] if r["room_id"] not in removed_rooms] + list(scenario.get("add_rooms", []))
+
+    removed_teachers = set(scenario.get("remove_teachers", []))
+    subject_teachers = defaultdict(list, {sid: [tid for tid in teachers if tid not in removed_teachers]
+                                          for sid, teachers in inputs["subject_teachers"].items()})
+    for sid, tid in scenario.get("add_teach", []):
+        if tid not in subject_teachers[sid]:
+            subject_teachers[sid].append(tid)
+
+    subjects = {sid: dict(s, **scenario.get("subjects", {}).get(sid, {})) for sid, s in inputs["subjects"].items()}
+
+    removed_register = {tuple(pair) for pair in scenario.get("remove_register", [])}
+    group_subjects = defaultdict(list, {g: [sid for sid in sids if (g, sid) not in removed_register]
+                                        for g, sids in inputs["group_subjects"].items()})
+    for g, sid in scenario.get("add_register", []):
+        if sid not in group_subjects[g]:
+            group_subjects[g].append(sid)
+
+    sizes = scenario.get("group_sizes", {})
+    groups = [dict(g, student_count=sizes.get(g["group_id"], g["student_count"])) for g in inputs["groups"]]
+
+    teacher_unavailable = dict(inputs.get("teacher_unavailable", {}))
+    teacher_unavailable.update({tid: [tuple(b) for b in blocked]
+                                for tid, blocked in scenario.get("teacher_unavailable", {}).items()})
+
+    return dict(inputs, groups=groups, subjects=subjects, rooms=rooms, subject_teachers=subject_teachers,
+                group_subjects=group_subjects, teacher_unavailable=teacher_unavailable,
+                blocked_slots=scenario.get("blocked_slots", inputs["blocked_slots"]))
+
+
+def room_utilization(assignments, data):
+    """สัดส่วนคาบห้องที่ถูกใช้ต่อคาบห้องทั้งหมด (ห้อง x คาบ)"""
+    capacity = len(data["rooms"]) * len(data["timeslots"])
+    used = sum(subject_hours(data["subjects"][sid]) for _, sid, _, _, _ in assignments)
+    return used / capacity if capacity else 0
+
+
+def run_scenario(inputs, scenario, engine, max_time_in_seconds, num_workers, random_seed, quality):
+    """แก้ scenario เดียว คืนแถวของตารางเปรียบเทียบ (รันใน process แยก ไม่บันทึก output)"""
+    data = inputs_data(apply_scenario(inputs, scenario))
+    row = {"name": scenario.get("name", ""), "status": None, "wall_time": 0, "problems": [],
+           "room_utilization": None, "group_gaps": None, "teacher_gaps": None, "room_changes": None, "unplaced": 0}
+    row["problems"] = [f"[{kind}] {name}: {message}" for kind, name, message in precheck(data)]
+    if row["problems"]:
+        row["status"] = "PRECHECK"
+        return row
+
+    built = build_model(data, engine, quality=quality)
+    add_hints(built, greedy_schedule(data)[0])
+    result = solve(built, data, max_time_in_seconds, num_workers, random_seed)
+    row["status"] = "DRAFT" if result.get("draft") else result["status_name"]
+    row["wall_time"] = result["wall_time"]
+    if result["assignments"] is not None:
+        row["room_utilization"] = room_utilization(result["assignments"], data)
+        row["unplaced"] = len(result.get("unplaced", []))
+        metrics = quality_metrics(result["assignments"], data)
+        row.update({key: metrics[key] for key in ("group_gaps", "teacher_gaps", "room_changes")})
+    return row
+
+
+def run_scenarios(inputs, scenarios, engine="interval", max_time_in_seconds=60, num_workers=0, random_seed=0,
+                  quality=False, on_scenario=None):
+    """แก้หลาย scenario พร้อมกันใน process pool คืนแถวเปรียบเทียบตามลำดับ scenarios (แถวแรกคือข้อมูลปัจจุบัน)
+
+    inputs มาจาก load_inputs() แต่ละ scenario แก้ข้อมูลด้วย apply_scenario() ไม่มีการเขียนฐานข้อมูล
+    on_scenario(row) ถูกเรียกเมื่อแต่ละ scenario เสร็จ
+    """
+    scenarios = [{"name": "baseline"}] + list(scenarios)
+    for scenario in scenarios:
+        apply_scenario(inputs, scenario)  # ตรวจ key ก่อนเริ่ม process
+    total_workers = num_workers or os.cpu_count() or 1
+    processes = max(1, min(len(scenarios), total_workers))
+    per_process = max(1, total_workers // processes)
+
+    rows = [None] * len(scenarios)
+    # spawn: ไม่ fork process ที่มี thread ของ Streamlit/solver อยู่
+    with ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = {pool.submit(run_scenario, inputs, scenario, engine, max_time_in_seconds, per_process,
+                               random_seed, quality): k
+                   for k, scenario in enumerate(scenarios)}
+        for future in as_completed(futures):
+            k = futures[future]
+            rows[k] = future.result()
+            if on_scenario:
+                on_scenario(rows[k])
+    return rows
+
+
+# ======================
+# DIAGNOSE
+# ======================
+def diagnose(data, max_time_in_seconds=120, num_workers=1):
+    """หาชุด group/teacher/room เล็ก ๆ ที่ขัดกันเอง (infeasibility core)
+
+    ข้อจำกัด no-overlap ของแต่ละ group/teacher/room ถูกคุมด้วย assumption literal ของตัวเอง แล้วใช้
+    SufficientAssumptionsForInfeasibility หา core จากนั้นลองตัดทีละตัวจนเหลือชุดที่เล็กลง
+    คืน [(kind, name)] หรือ None ถ้าโมเดลไม่ infeasible (มีคำตอบ/หมดเวลา)
+    """
+    built = build_interval_model(data, guarded=True)
+    model = built["model"]
+    guards = built["guards"]
+
+    def infeasible(keys, time_limit):
+        model.ClearAssumptions()
+        model.AddAssumptions([guards[k] for k in keys])
+        solver = cp_model.CpSolver()
+        solver.parameters.max_time_in_seconds = time_limit
+        solver.parameters.num_workers = num_workers
+        return solver, solver.Solve(model) == cp_model.INFEASIBLE
+
+    solver, is_infeasible = infeasible(list(guards), max_time_in_seconds)
+    if not is_infeasible:
+        return None
+    by_index = {lit.Index(): key for key, lit in guards.items()}
+    core = [by_index[i] for i in solver.SufficientAssumptionsForInfeasibility()]
+
+    # ลองตัดทีละตัว ถ้ายัง infeasible ก็ไม่จำเป็นต้องอยู่ใน core
+    spent = 0
+    for key in list(core):
+        if spent >= max_time_in_seconds or len(core) == 1:
+            break
+        rest = [k for k in core if k != key]
+        solver, still = infeasible(rest, min(10, max_time_in_seconds - spent))
+        spent += solver.WallTime()
+        if still:
+            core = rest
+    return core
+
+
+# ======================
+# OUTPUT
+# ======================
+
+
+def assignment_rows(assignments, data):
+    """ขยาย (group, subject, teacher, room, start) เป็นแถวต่อคาบ"""
+    timeslots = data["timeslots"]
+    rows = []
+    for g, sid, tid, rid, i in assignments:
+        for idx in range(i, i + subject_hours(data["subjects"][sid])):
+            if idx < len(timeslots):
+                rows.append((g, timeslots[idx]["timeslot_id"], sid, tid, rid))
+    return rows
+
+
+def save_output(rows):
+    """ลบตาราง output เดิมแล้วบันทึกผลลัพธ์ใหม่"""
+    db.execute("DELETE FROM output")
+    if rows:
+        db.executemany("""
+            INSERT INTO output
+            (group_id, timeslot_id, subject_id, teacher_id, room_id)
+            VALUES (%s, %s, %s, %s, %s)
+        """, rows)
+
+
+# ======================
+# GENERATE
+# ======================
+# ค่าเริ่มต้นของ generate() (ตรงกับค่าเริ่มต้นของ timetable.py และหน้า timetable)
+GENERATE_OPTIONS = {
+    "engine": "boolean",
+    "time_limit": 300,
+    "num_workers": 0,
+    "random_seed": 0,
+    "stop_at_first": False,
+    "warm_start": True,
+    "cache": True,
+    "delta": False,
+    "delta_depth": 1,
+    "diagnose": False,
+    "split": False,
+    "quality": False,
+    "relative_gap": 0,
+    "race": False,
+    "draft_only": False,
+}
+
+
+def generate(data, options, report=None):
+    """จัดตารางทั้งขั้นตอนแล้วบันทึกลง output (ใช้ร่วมกันระหว่าง timetable.py และ worker.py)
+
+    โหลด output เดิม -> delta -> precheck -> ร่าง greedy -> draft / race / components / solve -> diagnose -> บันทึก
+    options = GENERATE_OPTIONS ที่แก้บางค่า
+    report(event, info) ถูกเรียกทุกขั้นให้แต่ละหน้าแสดงผลเอง event ได้แก่ "previous", "delta", "precheck", "draft",
+    "race", "component", "build", "model", "hints", "solve", "solution", "result", "saved" (rows None = คง output เดิม),
+    "diagnose"
+    ถ้า report("solution", info) คืน True จะหยุดค้นหาและใช้คำตอบล่าสุด (เหมือน stop_at_first)
+
+    คืน dict: "outcome" ("precheck" | "kept" | "done" | "failed"), "problems" (เมื่อ precheck ไม่ผ่าน), "result",
+    "pinned", "solve_data", "rows" ที่บันทึก (None = ไม่แตะ output เดิม) และ "core" เมื่อ diagnose
+    """
+    options = dict(GENERATE_OPTIONS, **options)
+    report = report or (lambda event, info: None)
+    time_limit, num_workers, random_seed = options["time_limit"], options["num_workers"], options["random_seed"]
+
+    previous = []
+    if options["warm_start"] or options["delta"]:
+        try:
+            previous = load_output_assignments(data)
+            report("previous", {"classes": len(previous)})
+        except Exception as e:
+            report("previous", {"error": e})
+
+    solve_data, pinned = data, []
+    if options["delta"]:
+        solve_data, pinned, freed = delta_data(data, previous, options["delta_depth"])
+        report("delta", {"freed": freed, "pinned": pinned, "data": solve_data})
+
+    problems = precheck(solve_data)
+    report("precheck", {"problems": problems})
+    if problems:
+        return {"outcome": "precheck", "problems": problems, "rows": None}
+
+    # ร่าง greedy ใช้เป็นผลลัพธ์ (draft_only) หรือ hint ของ solver: output เดิมที่ยังใช้ได้ถูกลงก่อน แล้วเติมส่วนที่เหลือ
+    hints = []
+    if options["draft_only"] or options["warm_start"]:
+        draft = solve_greedy(solve_data, previous if options["warm_start"] else None)
+        hints = draft["assignments"]
+        report("draft", draft)
+
+    def on_solution(info):
+        return bool(report("solution", info)) or options["stop_at_first"]
+
+    parts = components(solve_data) if options["split"] and not (options["draft_only"] or options["race"]) else []
+    if options["draft_only"]:
+        result = draft
+    elif options["race"]:
+        report("race", {"done": 0, "total": len(RACE_CONFIGS)})
+        result = race(solve_data, None, time_limit, num_workers, random_seed, hints=hints, cache=options["cache"],
+                      quality=options["quality"], relative_gap=options["relative_gap"],
+                      on_finish=lambda info: report("race", info))
+    elif len(parts) > 1:
+        report("component", {"done": 0, "total": len(parts), "parts": parts})
+        result = solve_components(solve_data, parts, options["engine"], time_limit, num_workers, random_seed,
+                                  hints=hints, cache=options["cache"],
+                                  on_component=lambda info: report("component", info),
+                                  quality=options["quality"], relative_gap=options["relative_gap"])
+    else:
+        built = build_model(solve_data, engine=options["engine"],
+                            progress=lambda done, total: report("build", {"done": done, "total": total}),
+                            cache=options["cache"], quality=options["quality"])
+        report("model", {"built": built})
+        if hints:
+            report("hints", {"hinted": add_hints(built, hints)})
+        report("solve", {})
+        result = solve(built, solve_data, time_limit, num_workers, random_seed, on_solution,
+                       options["relative_gap"])
+    report("result", result)
+
+    if result["assignments"] is not None:
+        rows = assignment_rows(pinned + result["assignments"], data)
+        save_output(rows)
+        kind = "done"
+    elif options["delta"]:
+        # delta ไม่มีคำตอบ: คงตารางเดิมไว้
+        rows, kind = None, "kept"
+    else:
+        rows, kind = [], "failed"
+        save_output(rows)
+    report("saved", {"rows": rows})
+
+    outcome = {"outcome": kind, "result": result, "pinned": pinned, "solve_data": solve_data, "rows": rows}
+    # หมดเวลาแล้วได้แค่ร่าง greedy ที่ลงไม่ครบ ก็วิเคราะห์ได้ (โมเดล interval พิสูจน์ infeasible ได้เร็วกว่า)
+    if options["diagnose"] and (result["assignments"] is None or result.get("unplaced")):
+        report("diagnose", {})
+        outcome["core"] = diagnose(solve_data, time_limit, num_workers) or []
+    return outcome
@@ -1,317 +1,292 @@
 from ortools.sat.python import cp_model
+import argparse
 import db
-from collections import defaultdict
+import os
+import scheduler
 import sys
 
-print("Starting timetable generation...")
-print("="*60)
+parser = argparse.ArgumentParser(description="Generate timetable into the output table")
+parser.add_argument("--engine", choices=list(scheduler.ENGINES), default="boolean",
+                    help="model formulation (default: boolean)")
+parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                    help="CP-SAT search workers (default: all cores)")
+parser.add_argument("--time-limit", type=float, default=300,
+                    help="solver time limit in seconds (default: 300)")
+parser.add_argument("--seed", type=int, default=0, help="solver random seed")
+parser.add_argument("--stop-at-first", action="store_true",
+                    help="stop as soon as the first feasible timetable is found")
+parser.add_argument("--quality", action="store_true",
+                    help="minimize idle periods of groups/teachers and room changes instead of accepting any timetable")
+parser.add_argument("--gap", type=float, default=0,
+                    help="with --quality, stop once the relative gap to the best bound is at most this (e.g. 0.05)")
+parser.add_argument("--no-warm-start", dest="warm_start", action="store_false",
+                    help="do not hint the solver with the current output table")
+parser.add_argument("--draft", action="store_true",
+                    help="only build a greedy draft timetable (about a second, may leave classes unplaced), skip CP-SAT")
+parser.add_argument("--delta", action="store_true",
+                    help="only re-solve classes affected by data changes, keep the rest of output fixed")
+parser.add_argument("--delta-depth", type=int, default=1,
+                    help="how many shared teacher/room hops to free around changed groups (default: 1)")
+parser.add_argument("--no-cache", dest="cache", action="store_false",
+                    help="always rebuild and re-solve instead of reusing the cached model/solution for unchanged input")
+parser.add_argument("--race", action="store_true",
+                    help="race several engines/seeds/search strategies in parallel processes and keep the best result")
+parser.add_argument("--components", action="store_true",
+                    help="solve groups that share no teacher or room as separate models in a process pool")
+parser.add_argument("--diagnose", action="store_true",
+                    help="when no timetable is found, search for a small set of conflicting groups/teachers/rooms")
 
-# ======================
-# CONFIGURATION
-# ======================
-model = cp_model.CpModel()
 
-# กลุ่มเรียน
-try:
-    GROUPS = [g["group_id"] for g in db.fetch_all("SELECT group_id FROM student_group")]
-    print(f"✓ Groups loaded: {len(GROUPS)}")
-    print(f"  Groups: {GROUPS}")
-except Exception as e:
-    print(f"✗ Error loading groups: {e}")
-    sys.exit(1)
-
-# วิชา
-try:
-    SUBJECTS = db.fetch_all("SELECT subject_id, theory, practice FROM subject")
-    SUBJECT_DICT = {s["subject_id"]: s for s in SUBJECTS}
-    print(f"✓ Subjects loaded: {len(SUBJECTS)}")
-except Exception as e:
-    print(f"✗ Error loading subjects: {e}")
-    sys.exit(1)
+def main():
+    args = parser.parse_args()
 
-# คาบเรียน
-try:
-    TIMESLOTS = db.fetch_all("""
-        SELECT timeslot_id, day, period
-        FROM timeslot
-        WHERE period != 5
-        ORDER BY day, period
-    """)
-    TS_INDEX = {t["timeslot_id"]: i for i, t in enumerate(TIMESLOTS)}
-    print(f"✓ Timeslots loaded: {len(TIMESLOTS)}")
-except Exception as e:
-    print(f"✗ Error loading timeslots: {e}")
-    sys.exit(1)
+    print("Starting timetable generation...")
+    print("="*60)
 
-# สร้าง mapping: วัน -> [indices ของ timeslots ในวันนั้น]
-DAY_TIMESLOTS = defaultdict(list)
-for i, t in enumerate(TIMESLOTS):
-    DAY_TIMESLOTS[t["day"]].append(i)
+    # ======================
+    # CONFIGURATION
+    # ======================
+    try:
+        data = scheduler.load_data(progress=print)
+    except Exception as e:
+        print(f"✗ Error loading data: {e}")
+        sys.exit(1)
 
-PERIODS_PER_DAY = max(len(slots) for slots in DAY_TIMESLOTS.values())
-print(f"✓ Periods per day: {PERIODS_PER_DAY}")
-print(f"✓ Total days: {len(DAY_TIMESLOTS)}")
-for day in sorted(DAY_TIMESLOTS.keys()):
-    print(f"  Day {day}: {len(DAY_TIMESLOTS[day])} periods")
+    GROUPS = data["groups"]
+    SUBJECT_DICT = data["subjects"]
+    TIMESLOTS = data["timeslots"]
+    DAY_TIMESLOTS = data["day_timeslots"]
+    GROUP_SUBJECTS = data["group_subjects"]
+    PERIODS_PER_DAY = data["periods_per_day"]
 
-# ลงทะเบียนวิชา
-try:
-    REG = db.fetch_all("SELECT group_id, subject_id FROM register")
-    GROUP_SUBJECTS = {}
-    for r in REG:
-        GROUP_SUBJECTS.setdefault(r["group_id"], []).append(r["subject_id"])
-    print(f"✓ Registrations loaded: {len(REG)}")
+    print(f"✓ Groups loaded: {len(GROUPS)}")
+    print(f"  Groups: {GROUPS}")
+    print(f"✓ Subjects loaded: {len(SUBJECT_DICT)}")
+    print(f"✓ Timeslots loaded: {len(TIMESLOTS)}")
+    print(f"✓ Periods per day: {PERIODS_PER_DAY}")
+    print(f"✓ Total days: {len(DAY_TIMESLOTS)}")
+    for day in sorted(DAY_TIMESLOTS.keys()):
+        print(f"  Day {day}: {len(DAY_TIMESLOTS[day])} periods")
+    print(f"✓ Registrations loaded: {sum(len(v) for v in GROUP_SUBJECTS.values())}")
     for g in GROUPS:
         print(f"  {g}: {len(GROUP_SUBJECTS.get(g, []))} subjects")
-except Exception as e:
-    print(f"✗ Error loading registrations: {e}")
-    sys.exit(1)
-
-# ครูผู้สอน
-try:
-    TEACH = db.fetch_all("SELECT subject_id, teacher_id FROM teach")
-    SUBJECT_TEACHERS = {}
-    for r in TEACH:
-        SUBJECT_TEACHERS.setdefault(r["subject_id"], []).append(r["teacher_id"])
-    print(f"✓ Teacher assignments loaded: {len(TEACH)}")
-except Exception as e:
-    print(f"✗ Error loading teacher assignments: {e}")
-    sys.exit(1)
-
-# ห้องเรียน
-try:
-    ROOMS = [r["room_id"] for r in db.fetch_all("SELECT room_id FROM room")]
-    print(f"✓ Rooms loaded: {len(ROOMS)}")
-except Exception as e:
-    print(f"✗ Error loading rooms: {e}")
-    sys.exit(1)
-
-# ======================
-# CREATE VARIABLES
-# ======================
-print("\n" + "="*60)
-print("Creating variables...")
-print("="*60)
+    print(f"✓ Teacher assignments loaded: {sum(len(v) for v in data['subject_teachers'].values())}")
+    print(f"✓ Rooms loaded: {len(data['rooms'])}")
 
-x = {}  # (group, subject, teacher, room, start_timeslot) → BoolVar
-skipped_subjects = []
+    options = {
+        "engine": args.engine, "time_limit": args.time_limit, "num_workers": args.workers, "random_seed": args.seed,
+        "stop_at_first": args.stop_at_first, "warm_start": args.warm_start, "cache": args.cache,
+        "delta": args.delta, "delta_depth": args.delta_depth, "diagnose": args.diagnose, "split": args.components,
+        "quality": args.quality, "relative_gap": args.gap, "race": args.race, "draft_only": args.draft,
+    }
 
-for g in GROUPS:
-    for sid in GROUP_SUBJECTS.get(g, []):
-        s = SUBJECT_DICT[sid]
-        hours = (s["theory"] or 0) + (s["practice"] or 0)
-        
-        # ถ้าวิชามากกว่า periods ต่อวัน ให้ข้ามไป
-        if hours > PERIODS_PER_DAY:
-            print(f"⚠️  Skipping {g}-{sid}: needs {hours} hours but only {PERIODS_PER_DAY} periods/day")
-            skipped_subjects.append((g, sid, hours))
-            continue
-
-        teachers = SUBJECT_TEACHERS.get(sid, [])
-        if not teachers:
-            teachers = ["T00"]  # dummy teacher
+    def section(title):
+        print("\n" + "="*60)
+        print(title)
+        print("="*60)
 
-        vars_created_for_subject = 0
-        
-        # สร้างตัวแปรเฉพาะ timeslots ที่ไม่ล้นวัน
-        for i in range(len(TIMESLOTS)):
-            day = TIMESLOTS[i]["day"]
-            day_slots = DAY_TIMESLOTS[day]
-            
-            # ตรวจสอบว่า i อยู่ในวันนี้หรือไม่
-            if i in day_slots:
-                pos_in_day = day_slots.index(i)
-                
-                # ตรวจสอบว่ามีที่พอสำหรับ block หรือไม่
-                if pos_in_day + hours <= len(day_slots):
-                    # ตรวจสอบว่า indices ต่อเนื่องกัน
-                    block_indices = [i + k for k in range(hours)]
-                    expected_indices = day_slots[pos_in_day:pos_in_day + hours]
-                    
-                    if block_indices == expected_indices:
-                        for tid in teachers:
-                            for rid in ROOMS:
-                                x[g, sid, tid, rid, i] = model.NewBoolVar(f"x_{g}_{sid}_{tid}_{rid}_{i}")
-                                vars_created_for_subject += 1
-        
-        if vars_created_for_subject == 0:
-            print(f"⚠️  WARNING: No valid slots for {g}-{sid} ({hours} hours)")
+    state = {"solve_data": data}
 
-print(f"\n✓ Total variables created: {len(x)}")
+    def on_event(event, info):
+        if event == "previous":
+            if "error" in info:
+                print(f"⚠️  Could not load current output: {info['error']}")
+            else:
+                print(f"✓ Current output loaded: {info['classes']} classes")
+        elif event == "delta":
+            state["solve_data"] = info["data"]
+            print(f"✓ Delta mode: re-solving {len(info['freed'])} classes, keeping {len(info['pinned'])} classes fixed")
+            print(f"  Affected groups: {sorted({g for g, _ in info['freed']})}")
+        elif event == "precheck":
+            # ======================
+            # PRE-CHECK
+            # ======================
+            section("Checking capacity...")
+            if info["problems"]:
+                print(f"✗ Pre-check failed with {len(info['problems'])} problem(s), solver not started:")
+                for kind, name, message in info["problems"]:
+                    print(f"  - [{kind}] {name}: {message}")
+            else:
+                print("✓ Groups, teachers, day blocks and rooms are within capacity")
+        elif event == "draft":
+            # ======================
+            # GREEDY DRAFT
+            # ======================
+            section("Building greedy draft...")
+            print(f"✓ Greedy draft: {len(info['assignments'])} classes placed, {len(info['unplaced'])} unplaced "
+                  f"in {info['wall_time']:.2f}s")
+        elif event == "race":
+            if info["done"] == 0:
+                # ======================
+                # RACE CONFIGURATIONS
+                # ======================
+                section(f"Racing {info['total']} solver configurations in parallel...")
+            else:
+                objective = "" if info["objective"] is None else f", objective {info['objective']:g}"
+                print(f"  {info['label']}: {info['status_name']} at {info['wall_time']:.2f}s{objective}")
+        elif event == "component":
+            if info["done"] == 0:
+                # ======================
+                # SOLVE INDEPENDENT COMPONENTS
+                # ======================
+                section(f"Solving {info['total']} independent components in parallel... (engine: {args.engine})")
+                print(f"  Groups per component: {[len(groups) for groups in info['parts']]}")
+            else:
+                print(f"  component {info['done']}/{info['total']} ({info['groups']} groups): "
+                      f"{info['status_name']} in {info['wall_time']:.2f}s")
+        elif event == "model":
+            print_model(info["built"])
+        elif event == "hints":
+            print(f"✓ Warm start: hinted {info['hinted']} classes from current output + greedy draft")
+        elif event == "solve":
+            print(f"Solving... (time limit {args.time_limit:g}s, {args.workers} workers, seed {args.seed})")
+        elif event == "solution":
+            objective = "" if info["objective"] is None else f", objective {info['objective']:g} (bound {info['bound']:g})"
+            print(f"  solution #{info['solutions']} at {info['wall_time']:.2f}s{objective}")
+        elif event == "result":
+            state["result"] = info
+            print_result(info)
+        elif event == "saved":
+            print_saved(info["rows"])
+        elif event == "diagnose":
+            print("\nSearching for a conflicting core (--diagnose)...")
 
-if skipped_subjects:
-    print(f"\n⚠️  Skipped {len(skipped_subjects)} subject assignments (too long):")
-    for g, sid, hours in skipped_subjects:
-        print(f"  - {g} {sid}: {hours} hours")
+    def print_model(built):
+        # ======================
+        # CREATE VARIABLES
+        # ======================
+        section(f"Creating variables... (engine: {args.engine})")
+        model = built["model"]
+        skipped_subjects = built["skipped_subjects"]
+        subjects_without_vars = built["subjects_without_vars"]
+        counts = built["counts"]
 
-# ======================
-# CONSTRAINTS
-# ======================
-print("\n" + "="*60)
-print("Adding constraints...")
-print("="*60)
+        print(f"\n✓ Total variables created: {len(model.Proto().variables)}")
+        if built.get("cached"):
+            print("✓ Model loaded from cache (input unchanged)")
 
-# 1. Each subject must be scheduled exactly once
-constraint_count = 0
-subjects_without_vars = []
-for g in GROUPS:
-    for sid in GROUP_SUBJECTS.get(g, []):
-        vars_ = [x[g, sid, tid, rid, i] for (gg, ss, tid, rid, i) in x if gg==g and ss==sid]
-        if vars_:
-            model.Add(sum(vars_) == 1)
-            constraint_count += 1
-        else:
-            subjects_without_vars.append((g, sid))
-            
-print(f"✓ Subject assignment constraints: {constraint_count}")
-if subjects_without_vars:
-    print(f"⚠️  WARNING: {len(subjects_without_vars)} subjects have no valid timeslots:")
-    for g, sid in subjects_without_vars[:5]:  # แสดง 5 รายการแรก
-        hours = (SUBJECT_DICT[sid]["theory"] or 0) + (SUBJECT_DICT[sid]["practice"] or 0)
-        print(f"  - {g} {sid} ({hours} hours)")
-    if len(subjects_without_vars) > 5:
-        print(f"  ... and {len(subjects_without_vars) - 5} more")
+        if skipped_subjects:
+            print(f"\n⚠️  Skipped {len(skipped_subjects)} subject assignments (too long, only {PERIODS_PER_DAY} periods/day):")
+            for g, sid, hours in skipped_subjects:
+                print(f"  - {g} {sid}: {hours} hours")
 
-# 2. No overlap: GROUP
-constraint_count = 0
-for g in GROUPS:
-    for t in range(len(TIMESLOTS)):
-        overlaps = []
-        for (gg, sid, tid, rid, i), var in x.items():
-            if gg != g:
-                continue
-            hours = (SUBJECT_DICT[sid]["theory"] or 0) + (SUBJECT_DICT[sid]["practice"] or 0)
-            if i <= t < i + hours:
-                overlaps.append(var)
-        if overlaps:
-            model.Add(sum(overlaps) <= 1)
-            constraint_count += 1
-print(f"✓ Group no-overlap constraints: {constraint_count}")
+        # ======================
+        # CONSTRAINTS
+        # ======================
+        section("Adding constraints...")
+        print(f"✓ Subject assignment constraints: {counts['subject']}")
+        if subjects_without_vars:
+            print(f"⚠️  WARNING: {len(subjects_without_vars)} subjects have no valid timeslots:")
+            for g, sid in subjects_without_vars[:5]:  # แสดง 5 รายการแรก
+                hours = scheduler.subject_hours(SUBJECT_DICT[sid])
+                print(f"  - {g} {sid} ({hours} hours)")
+            if len(subjects_without_vars) > 5:
+                print(f"  ... and {len(subjects_without_vars) - 5} more")
+        print(f"✓ Group no-overlap constraints: {counts['group']}")
+        print(f"✓ Teacher no-overlap constraints: {counts['teacher']}")
+        print(f"✓ Room no-overlap constraints: {counts['room']}")
+        print(f"✓ Redundant clique constraints (classes that pairwise conflict): {counts['clique']}")
+        print(f"✓ Symmetry-breaking constraints (identical groups/rooms): {counts['symmetry']}")
+        if "objective" in counts:
+            print(f"✓ Quality objective terms (idle periods, extra rooms): {counts['objective']}")
 
-# 3. No overlap: TEACHER
-all_teachers = set(tid for tids in SUBJECT_TEACHERS.values() for tid in tids)
-all_teachers.add("T00")
-constraint_count = 0
-for tid in all_teachers:
-    for t in range(len(TIMESLOTS)):
-        overlaps = []
-        for (g, sid, tt, rid, i), var in x.items():
-            if tt != tid:
-                continue
-            hours = (SUBJECT_DICT[sid]["theory"] or 0) + (SUBJECT_DICT[sid]["practice"] or 0)
-            if i <= t < i + hours:
-                overlaps.append(var)
-        if overlaps:
-            model.Add(sum(overlaps) <= 1)
-            constraint_count += 1
-print(f"✓ Teacher no-overlap constraints: {constraint_count}")
+        # ======================
+        # SOLVE
+        # ======================
+        section("Starting solver...")
 
-# 4. No overlap: ROOM
-constraint_count = 0
-for rid in ROOMS:
-    for t in range(len(TIMESLOTS)):
-        overlaps = []
-        for (g, sid, tid, rr, i), var in x.items():
-            if rr != rid:
-                continue
-            hours = (SUBJECT_DICT[sid]["theory"] or 0) + (SUBJECT_DICT[sid]["practice"] or 0)
-            if i <= t < i + hours:
-                overlaps.append(var)
-        if overlaps:
-            model.Add(sum(overlaps) <= 1)
-            constraint_count += 1
-print(f"✓ Room no-overlap constraints: {constraint_count}")
+    def print_result(result):
+        status = result["status"]
+        print(f"\n{'='*60}")
+        print(f"SOLVER RESULTS")
+        print(f"{'='*60}")
+        print(f"Status: {result['status_name']}")
+        print(f"  OPTIMAL: {status == cp_model.OPTIMAL}")
+        print(f"  FEASIBLE: {status == cp_model.FEASIBLE}")
+        print(f"  INFEASIBLE: {status == cp_model.INFEASIBLE}")
+        if result.get("cached"):
+            print("  Restored from cache (same input and solver settings)")
+        if result.get("fallback"):
+            print("  Room matching failed, re-solved with the joint interval model")
+        if result.get("winner"):
+            print(f"  Race winner: {result['winner']}")
+            for label, status_name, wall_time in result["race"]:
+                print(f"    {label}: {status_name}" + ("" if wall_time is None else f" ({wall_time:.2f}s)"))
+        if result.get("draft"):
+            print(f"  Greedy draft (not solved by CP-SAT): {len(result['unplaced'])} classes could not be placed")
+            for g, sid in result["unplaced"][:5]:
+                print(f"  - {g} {sid}")
+            if len(result["unplaced"]) > 5:
+                print(f"  ... and {len(result['unplaced']) - 5} more")
+        print(f"Wall time: {result['wall_time']:.2f}s")
+        if "objective" in result:
+            print(f"Objective: {result['objective']:g}, bound {result['bound']:g}, gap {result['gap']:.1%}")
+        if result["assignments"] is not None:
+            metrics = scheduler.quality_metrics(result["assignments"], state["solve_data"])
+            print(f"Idle periods: groups {metrics['group_gaps']}, teachers {metrics['teacher_gaps']}; "
+                  f"extra rooms per group: {metrics['room_changes']}")
 
-# ======================
-# SOLVE
-# ======================
-print("\n" + "="*60)
-print("Starting solver...")
-print("="*60)
+    def print_saved(rows):
+        # ======================
+        # INSERT OUTPUT
+        # ======================
+        section("Saving results...")
 
-solver = cp_model.CpSolver()
-solver.parameters.max_time_in_seconds = 300
+        if rows is None:
+            print("✗ No solution found for the affected groups, output left unchanged")
+            print("  Try a larger --delta-depth or a full run without --delta")
 
-print("Solving... (this may take up to 5 minutes)")
-status = solver.Solve(model)
+        elif state["result"]["assignments"] is not None:
+            print("✓ Solution found! Inserting into database...")
+            print(f"✓ Inserted {len(rows)} rows into output table")
 
-print(f"\n{'='*60}")
-print(f"SOLVER RESULTS")
-print(f"{'='*60}")
-print(f"Status: {solver.StatusName(status)}")
-print(f"  OPTIMAL: {status == cp_model.OPTIMAL}")
-print(f"  FEASIBLE: {status == cp_model.FEASIBLE}")
-print(f"  INFEASIBLE: {status == cp_model.INFEASIBLE}")
-print(f"Wall time: {solver.WallTime():.2f}s")
+            # ตรวจสอบผลลัพธ์
+            row = db.fetch_one("SELECT COUNT(*) as count FROM output")
+            print(f"✓ Verified: {row['count']} rows in output table")
 
-# ======================
-# INSERT OUTPUT
-# ======================
-print("\n" + "="*60)
-print("Saving results...")
-print("="*60)
+            # แสดงสรุปแต่ละกลุ่ม
+            section("SCHEDULE SUMMARY BY GROUP")
+            for g in GROUPS:
+                row = db.fetch_one(f"SELECT COUNT(DISTINCT subject_id) as count FROM output WHERE group_id = '{g}'")
+                scheduled = row['count']
+                required = len(GROUP_SUBJECTS.get(g, []))
+                status_icon = "✓" if scheduled == required else "⚠️"
+                print(f"{status_icon} {g}: {scheduled}/{required} subjects scheduled")
 
-try:
-    db.execute("DELETE FROM output")
-    print("✓ Cleared old output data")
-except Exception as e:
-    print(f"✗ Error clearing output: {e}")
+        else:
+            print("✓ Cleared old output data")
+            print("✗ No solution found!")
+            if state["result"]["status"] == cp_model.INFEASIBLE:
+                print("\nThe capacity pre-check passed, so no single group, teacher or room set is")
+                print("overloaded on its own; the conflict comes from how their schedules interact.")
+            else:
+                print(f"\nThe solver stopped after {args.time_limit:g}s without a timetable.")
+                print("Try a longer --time-limit or the interval / two_stage engine.")
 
-if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
-    print("✓ Solution found! Inserting into database...")
-    count = 0
-    
     try:
-        for (g, sid, tid, rid, i), var in x.items():
-            if solver.Value(var) == 1:
-                hours = (SUBJECT_DICT[sid]["theory"] or 0) + (SUBJECT_DICT[sid]["practice"] or 0)
-                for k in range(hours):
-                    idx = i + k
-                    if idx < len(TIMESLOTS):
-                        ts_id = TIMESLOTS[idx]["timeslot_id"]
-                        db.execute("""
-                            INSERT INTO output
-                            (group_id, timeslot_id, subject_id, teacher_id, room_id)
-                            VALUES (%s, %s, %s, %s, %s)
-                        """, (g, ts_id, sid, tid, rid))
-                        count += 1
-        
-        print(f"✓ Inserted {count} rows into output table")
-        
-        # ตรวจสอบผลลัพธ์
-        result = db.fetch_one("SELECT COUNT(*) as count FROM output")
-        print(f"✓ Verified: {result['count']} rows in output table")
-        
-        # แสดงสรุปแต่ละกลุ่ม
-        print("\n" + "="*60)
-        print("SCHEDULE SUMMARY BY GROUP")
-        print("="*60)
-        for g in GROUPS:
-            result = db.fetch_one(f"SELECT COUNT(DISTINCT subject_id) as count FROM output WHERE group_id = '{g}'")
-            scheduled = result['count']
-            required = len(GROUP_SUBJECTS.get(g, []))
-            status_icon = "✓" if scheduled == required else "⚠️"
-            print(f"{status_icon} {g}: {scheduled}/{required} subjects scheduled")
-            
+        outcome = scheduler.generate(data, options, on_event)
     except Exception as e:
-        print(f"✗ Error inserting data: {e}")
+        print(f"✗ Error: {e}")
         import traceback
         traceback.print_exc()
-        
-else:
-    print("✗ No solution found!")
-    print("\nPossible reasons:")
-    if subjects_without_vars:
-        print(f"  - {len(subjects_without_vars)} subjects have no valid timeslots")
-    print("  - Not enough rooms for simultaneous classes")
-    print("  - Teacher conflicts (one teacher, multiple classes at same time)")
-    print("  - Total hours exceed available timeslots")
-    print("\nNext steps:")
-    print("  1. Check the warnings above")
-    print("  2. Consider splitting long subjects")
-    print("  3. Add more rooms or timeslots")
-    print("  4. Review teacher assignments")
+        sys.exit(1)
+
+    if outcome["outcome"] == "precheck":
+        sys.exit(1)
+
+    if "core" in outcome:
+        if outcome["core"]:
+            print("These schedules cannot all be satisfied together:")
+            for kind, name in outcome["core"]:
+                print(f"  [{kind}] {name}")
+        else:
+            print("  No conflicting core proven within the time limit")
+
+    print("\n" + "="*60)
+    print("DONE!")
+    print("="*60)
+
 
-print("\n" + "="*60)
-print("DONE!")
-print("="*60)
\ No newline at end of file
+# --components/--race ใช้ process แบบ spawn ซึ่ง import ไฟล์นี้ซ้ำ ห้ามรันสคริปต์อีกรอบ
+if __name__ == "__main__":
+    main()
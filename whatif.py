@@ -0,0 +1,72 @@
+import argparse
+import json
+import os
+import scheduler
+import sys
+
+parser = argparse.ArgumentParser(description="Compare what-if scenarios without touching the output table")
+parser.add_argument("scenarios", help="JSON file with a list of scenarios (see scheduler.apply_scenario)")
+parser.add_argument("--engine", choices=list(scheduler.ENGINES), default="interval",
+                    help="model formulation (default: interval)")
+parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                    help="CP-SAT search workers shared by all scenarios (default: all cores)")
+parser.add_argument("--time-limit", type=float, default=60,
+                    help="solver time limit per scenario in seconds (default: 60)")
+parser.add_argument("--seed", type=int, default=0, help="solver random seed")
+parser.add_argument("--quality", action="store_true",
+                    help="minimize idle periods and room changes in every scenario")
+
+
+def cell(value, width, fmt="{}"):
+    """จัดค่าในตารางเปรียบเทียบ (None แสดงเป็น -)"""
+    return f"{'-' if value is None else fmt.format(value):>{width}}"
+
+
+def main():
+    args = parser.parse_args()
+
+    with open(args.scenarios, encoding="utf-8") as f:
+        scenarios = json.load(f)
+
+    print("Loading data...")
+    print("="*60)
+    try:
+        inputs = scheduler.load_inputs(progress=print)
+    except Exception as e:
+        print(f"✗ Error loading data: {e}")
+        sys.exit(1)
+
+    # ======================
+    # SOLVE SCENARIOS
+    # ======================
+    print("\n" + "="*60)
+    print(f"Solving baseline + {len(scenarios)} scenarios in parallel... (engine: {args.engine})")
+    print("="*60)
+
+    try:
+        rows = scheduler.run_scenarios(inputs, scenarios, args.engine, args.time_limit, args.workers, args.seed,
+                                       args.quality, on_scenario=lambda row: print(f"  {row['name']}: {row['status']}"))
+    except ValueError as e:
+        print(f"✗ Invalid scenario: {e}")
+        sys.exit(1)
+
+    # ======================
+    # COMPARISON
+    # ======================
+    print("\n" + "="*60)
+    print("SCENARIO COMPARISON")
+    print("="*60)
+
+    print(f"{'scenario':<24} {'status':<10} {'time':>7} {'rooms used':>10} {'group gaps':>10} {'teacher gaps':>12} "
+          f"{'room changes':>12} {'unplaced':>8}")
+    for row in rows:
+        print(f"{row['name'][:24]:<24} {row['status']:<10} {row['wall_time']:>6.1f}s "
+              f"{cell(row['room_utilization'], 10, '{:.0%}')} {cell(row['group_gaps'], 10)} "
+              f"{cell(row['teacher_gaps'], 12)} {cell(row['room_changes'], 12)} {row['unplaced']:>8}")
+        for problem in row["problems"]:
+            print(f"    {problem}")
+
+
+# spawn process ลูกของ run_scenarios import ไฟล์นี้ซ้ำ ห้ามรันสคริปต์อีกรอบ
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+import argparse
+import os
+import socket
+import threading
+import time
+import traceback
+import jobs
+import scheduler
+
+parser = argparse.ArgumentParser(description="Run queued timetable jobs (solve_job table) outside the web server")
+parser.add_argument("--poll", type=float, default=2, help="seconds between checks for new jobs (default: 2)")
+parser.add_argument("--once", action="store_true", help="exit when the queue is empty")
+
+
+# ======================
+# RUN JOB
+# ======================
+def run_job(options, report, should_stop=None):
+    """จัดตารางตาม options ของงาน (scheduler.generate) คืน (status ของงาน, ข้อความ, ผลสรุป)
+
+    report(progress, message) ถูกเรียกระหว่างทำงาน ผลสรุปเก็บเป็น JSON ให้หน้าเว็บแสดง
+    should_stop() ถูกถามทุกครั้งที่ solver เจอคำตอบ ถ้าคืน True จะหยุดค้นหาและบันทึกคำตอบล่าสุด
+    """
+    time_limit = options["time_limit"]
+    stopped = [False]
+    data = scheduler.load_data(progress=lambda msg: report(0, f"🔹 {msg}"))
+
+    def on_event(event, info):
+        if event == "delta":
+            report(0, f"🔹 delta: จัดใหม่ {len(info['freed'])} วิชา ตรึง {len(info['pinned'])} วิชา")
+        elif event == "draft":
+            report(5, "🔹 ร่างตารางแบบ greedy...")
+        elif event == "race":
+            if info["done"] == 0:
+                report(10, f"🔹 แข่ง {info['total']} ชุดตั้งค่าพร้อมกัน...")
+            else:
+                report(10 + info["done"] / info["total"] * 80,
+                       f"🔸 {info['label']}: {info['status_name']} | {info['wall_time']:.1f}s")
+        elif event == "component":
+            if info["done"] == 0:
+                report(10, f"🔹 แก้ {info['total']} ส่วนที่ไม่ใช้ครู/ห้องร่วมกันพร้อมกัน...")
+            else:
+                report(10 + info["done"] / info["total"] * 80,
+                       f"🔸 เสร็จ {info['done']}/{info['total']} ส่วน | "
+                       f"{info['groups']} กลุ่ม {info['status_name']} | {info['wall_time']:.1f}s")
+        elif event == "build":
+            report(5 + info["done"] / info["total"] * 5, "🔹 การสร้างตัวแปรและข้อจำกัด...")
+        elif event == "model":
+            report(10, "🔹 ตารางเวลาการแก้ปัญหา...")
+        elif event == "solution":
+            objective = "" if info["objective"] is None else f" | objective {info['objective']:g} (bound {info['bound']:g})"
+            report(10 + min(info["wall_time"] / time_limit, 1) * 80,
+                   f"🔸 พบคำตอบ #{info['solutions']} | {info['wall_time']:.1f}s{objective}")
+            if should_stop and should_stop():
+                stopped[0] = True
+                return True
+        elif event == "diagnose":
+            report(90, "🔹 วิเคราะห์สาเหตุที่จัดตารางไม่ได้...")
+        elif event == "result":
+            report(90, "🔹 บันทึกผลลัพธ์ลงฐานข้อมูล...")
+
+    outcome = scheduler.generate(data, options, on_event)
+    if outcome["outcome"] == "precheck":
+        return "failed", "❌ ตรวจความจุไม่ผ่าน ไม่ได้เริ่ม solver", {"problems": outcome["problems"]}
+
+    result = outcome["result"]
+    summary = {key: result[key] for key in ("status_name", "wall_time", "cached", "winner", "objective", "bound",
+                                            "gap", "unplaced") if key in result}
+    if "core" in outcome:
+        summary["core"] = outcome["core"]
+    if outcome["outcome"] == "kept":
+        return "failed", "⚠️ ไม่พบคำตอบสำหรับกลุ่มที่เปลี่ยน ตารางเดิมไม่ถูกแก้ไข ลองเพิ่มระยะหรือสร้างใหม่ทั้งหมด", summary
+    if outcome["outcome"] == "failed":
+        return "failed", "❌ ไม่พบคำตอบ", summary
+    if stopped[0]:
+        return "done", "⏹ หยุดตามคำขอ บันทึกคำตอบที่ดีที่สุดที่หาได้แล้ว", summary
+    if result.get("unplaced"):
+        return "done", "⚠️ บันทึกตารางร่างแล้ว แต่ยังลงไม่ครบทุกวิชา", summary
+    return "done", "✅ Completed! ตารางเรียนถูกสร้างแล้ว", summary
+
+
+def reporter(job_id, interval=1.0):
+    """report() ที่เขียนความคืบหน้าลงฐานข้อมูลไม่เกินหนึ่งครั้งต่อ interval วินาที (callback ของ solver ถูกเรียกถี่)"""
+    last = [0.0]
+
+    def report(progress, message):
+        now = time.time()
+        if now - last[0] >= interval:
+            last[0] = now
+            jobs.update_job(job_id, progress, message)
+    return report
+
+
+def stopper(job_id, interval=1.0):
+    """should_stop() ที่อ่าน stop_requested จากฐานข้อมูลไม่เกินหนึ่งครั้งต่อ interval วินาที"""
+    last, stop = [0.0], [False]
+
+    def should_stop():
+        now = time.time()
+        if not stop[0] and now - last[0] >= interval:
+            last[0] = now
+            stop[0] = jobs.stop_requested(job_id)
+        return stop[0]
+    return should_stop
+
+
+def heartbeat(job_id, done):
+    """ส่ง heartbeat ทุก jobs.HEARTBEAT วินาทีจนกว่า done ถูก set (thread แยก เพราะ solver อาจไม่เรียก callback นาน)"""
+    while not done.wait(jobs.HEARTBEAT):
+        try:
+            jobs.heartbeat(job_id)
+        except Exception as e:
+            print(f"⚠️  heartbeat failed: {e}")
+
+
+# ======================
+# MAIN LOOP
+# ======================
+def main():
+    args = parser.parse_args()
+    host = socket.gethostname()
+    worker = f"{host}:{os.getpid()}"
+    jobs.recover_jobs(host)
+    print(f"Worker {worker} waiting for jobs...")
+
+    while True:
+        jobs.expire_jobs()
+        job = jobs.claim_job(worker)
+        if job is None:
+            if args.once:
+                break
+            time.sleep(args.poll)
+            continue
+
+        print(f"Job #{job['job_id']} started: {job['options']}")
+        started = time.time()
+        done = threading.Event()
+        threading.Thread(target=heartbeat, args=(job["job_id"], done), daemon=True).start()
+        try:
+            status, message, summary = run_job(job["options"], reporter(job["job_id"]), stopper(job["job_id"]))
+        except Exception as e:
+            traceback.print_exc()
+            status, message, summary = "failed", f"❌ เกิดข้อผิดพลาด: {e}", None
+        finally:
+            done.set()
+        jobs.finish_job(job["job_id"], status, message, summary)
+        print(f"Job #{job['job_id']} {status} in {time.time() - started:.1f}s: {message}")
+
+
+# race/components ใช้ process แบบ spawn ซึ่ง import ไฟล์นี้ซ้ำ ห้ามเริ่ม loop อีกรอบ
+if __name__ == "__main__":
+    main()